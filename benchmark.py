@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Measure the script against fake ambari clusters of various sizes.
+"""
+import argparse
+import sys
+
+from hadoopSettings import benchmark
+
+
+parser = argparse.ArgumentParser(
+    description='Run the script (without updating) against local fake ambari clusters, '
+    'and report wall time, number of requests, bytes received and peak memory, compared '
+    'with a saved baseline. Any other option is passed to the script, see settings.py --help.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    '--nodes', '-n',
+    dest='nodes',
+    type=lambda s: [int(n) for n in s.split(',')],
+    default='10,100,1000,5000',
+    help='Sizes of the clusters, in data nodes.'
+)
+parser.add_argument(
+    '--latency',
+    dest='latency',
+    type=float,
+    default=0,
+    help='Milliseconds fake ambari waits before answering each request.'
+)
+parser.add_argument(
+    '--repeat', '-r',
+    dest='repeat',
+    type=int,
+    default=3,
+    help='Runs per cluster, the best time is kept.'
+)
+parser.add_argument(
+    '--baseline',
+    dest='baseline',
+    type=str,
+    default='benchmark.json',
+    help='Baseline to compare with.'
+)
+parser.add_argument(
+    '--save',
+    dest='save',
+    action='store_true',
+    default=False,
+    help='Save the results as the new baseline.'
+)
+parser.add_argument(
+    '--startup',
+    dest='startup',
+    action='store_true',
+    default=False,
+    help='Only check that settings.py --help imports within budget (under python -X importtime), '
+    'failing otherwise.'
+)
+parser.add_argument(
+    '--startup-budget',
+    dest='startupBudget',
+    type=float,
+    default=benchmark.STARTUP_BUDGET,
+    help='Milliseconds settings.py --help may spend importing modules.'
+)
+args, common = parser.parse_known_args()
+
+if args.startup:
+    startup = benchmark.startup('settings.py', args.repeat, args.startupBudget)
+    print(benchmark.startupReport(startup))
+    sys.exit(0 if startup['ok'] else 1)
+
+results = []
+for nodes in args.nodes:
+    results.append(benchmark.measure(nodes, args.latency / 1000, args.repeat, common))
+    print(results[-1]['scenario'], 'done', flush=True)
+
+print(benchmark.report(results, benchmark.loadBaseline(args.baseline)))
+if args.save:
+    benchmark.saveBaseline(results, args.baseline)
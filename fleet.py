@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+Talk to many ambari servers in parallel to suggest configuration of all their clusters.
+"""
+import argparse
+import sys
+import time
+
+from hadoopSettings import fleet
+from hadoopSettings.results import RENDERERS
+
+
+parser = argparse.ArgumentParser(
+    description='Work out yarn configuration settings of many clusters at once. '
+    'Any other option is passed to all clusters, see settings.py --help.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    dest='inventory',
+    type=str,
+    help='File with one cluster per line, as settings.py arguments, '
+    'eg. "ambari1 --cluster prod -u admin". # starts a comment.'
+)
+parser.add_argument(
+    '--workers', '-w',
+    dest='workers',
+    type=int,
+    default=4,
+    help='Max number of clusters evaluated at the same time.'
+)
+parser.add_argument(
+    '--format',
+    dest='format',
+    choices=['text', 'jsonl', 'csv'],
+    default='text',
+    help='text for one consolidated report, or one json object (jsonl) or csv row '
+    'per result of each cluster, for programs.'
+)
+args, common = parser.parse_known_args()
+
+configs = fleet.readInventory(args.inventory, common)
+if any(config.update for config in configs):
+    parser.error('--update is not supported in fleet mode, use settings.py per cluster.')
+
+start = time.time()
+results = fleet.evaluateAll(configs, args.workers)
+if args.format == 'text':
+    print(fleet.report(results, time.time() - start))
+else:
+    fleet.write(results, RENDERERS[args.format](sys.stdout, extra=('cluster',)))
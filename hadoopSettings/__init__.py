@@ -0,0 +1,21 @@
+"""
+Work out hadoop settings of ambari managed clusters.
+
+    report = hadoopSettings.evaluate(Config(['ambari.example.com', '--cluster', 'prod']))
+
+evaluate and Report are only imported when first used, so that importing
+the package (eg. for Config) stays fast.
+"""
+
+# name => module it comes from
+LAZY = {
+    'evaluate': 'hadoopSettings.report',
+    'Report': 'hadoopSettings.report',
+}
+
+
+def __getattr__(name):
+    if name not in LAZY:
+        raise AttributeError("module 'hadoopSettings' has no attribute '{}'".format(name))
+    import importlib
+    return getattr(importlib.import_module(LAZY[name]), name)
@@ -0,0 +1,4 @@
+from hadoopSettings.cli import main
+
+
+main()
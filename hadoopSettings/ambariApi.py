@@ -1,21 +1,171 @@
-import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import pprint
+import random
 import requests
+import threading
 import time
 
-from hadoopSettings.exceptions import (ClusterNotFound, AmbariNotReachable)
+from hadoopSettings.breaker import CircuitBreaker
+from hadoopSettings.diskCache import DiskCache
+from hadoopSettings.exceptions import (
+    ClusterNotFound, AmbariNotReachable, BadResponse, ClientError, ConfigConflict, ServerError
+)
+from hadoopSettings.hostInventory import HostInventory
+from hadoopSettings.metrics import Metrics
+from hadoopSettings.recorder import (Recorder, Replayer)
+from hadoopSettings.snapshot import ConfigSnapshot
 
 pp = pprint.PrettyPrinter(indent=2)
 
+# Fields asked for, per resource: ambari only sends those (see Api.call).
+CLUSTER_FIELDS = ('Clusters/cluster_name',)
+DESIRED_CONFIGS_FIELDS = ('Clusters/desired_configs',)
+HOST_FIELDS = ('Hosts/host_name', 'Hosts/cpu_count', 'Hosts/total_mem', 'Hosts/rack_info')
+COMPONENT_HOSTS_FIELDS = ('host_components/HostRoles/host_name', 'host_components/HostRoles/cluster_name')
+
+# Statuses of ambari not understanding the paged DN query, see Api.iterDNs.
+PAGING_UNSUPPORTED = (400, 404)
+
+
+class ResponseCache():
+    """
+    Responses of Api.call, per (path, cluster, fields): at most `size` of
+    them, the least recently used going first, each kept `ttl` seconds.
+
+    Properties of a given (pset, tag) never change in ambari, so responses
+    to /configurations asking for explicit tags stay valid. Everything else
+    reflects the current state (desired configs, config groups...) and is
+    dropped by invalidate, after each change sent to ambari.
+    """
+
+    def __init__(self, size=128, ttl=300):
+        self.size = size
+        self.ttl = ttl
+        # key => (expiry, response), least recently used first.
+        self.entries = collections.OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+        # Guards entries and stats.
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Cached response for key, None if there is none.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                self.stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    @staticmethod
+    def immutable(key):
+        path = key[0]
+        return path.startswith('/configurations?') and 'tag=' in path
+
+    def invalidate(self):
+        """
+        Drop the responses a change may have made stale.
+        """
+        with self.lock:
+            for key in [k for k in self.entries if not self.immutable(k)]:
+                del self.entries[key]
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def report(self):
+        """
+        Line to display.
+        """
+        with self.lock:
+            return (
+                "Response cache: {n}/{s} entries, {hits} hits, {misses} misses, {evictions} evicted, "
+                "{expirations} expired, {invalidations} invalidated.".format(n=len(self.entries), s=self.size, **self.stats)
+            )
+
 
 class Api():
 
     def __init__(self, config):
         self.config = config
+        self.session = self.makeSession()
+        # What calls cost.
+        self.metrics = Metrics()
+        # Responses of call.
+        self.responses = ResponseCache(config.responseCacheSize, config.responseTtl)
+        # Stop calling an ambari which keeps failing.
+        self.breaker = CircuitBreaker.forServer(config.url, config.breakerThreshold, config.breakerCooldown)
+        # Save all responses, or answer from saved ones.
+        self.recorder = Recorder(config.record) if config.record else None
+        self.replayer = Replayer(config.replay) if config.replay else None
+        # DN inventory, fetched once.
+        self.dnInfo = None
+        # Live config values.
+        self.snapshot = ConfigSnapshot(self)
         # Needs to be set once.
         self.setClusterName()
+        # State kept between runs, per cluster.
+        self.diskCache = DiskCache(config) if config.cache and not self.replayer else None
+
+    def makeSession(self):
+        """
+        Build the pooled, keep-alive http session all calls go through.
+        Connections are reused between calls instead of opening a new
+        one (and doing a new TLS handshake) for each of them.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.config.poolSize,
+            pool_maxsize=self.config.poolSize
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.auth = requests.auth.HTTPBasicAuth(self.config.user, self.config.pwd)
+        session.headers.update({
+            'X-Requested-By': 'ambari',
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip, deflate' if self.config.gzip else 'identity',
+        })
+        return session
+
+    def close(self):
+        """
+        Release pooled connections, save recorded responses.
+        """
+        self.session.close()
+        if self.recorder:
+            self.recorder.save()
+
+    def url(self, path, cluster=True):
+        """
+        Full url for path.
+        If cluster=True, prefixes path with /clusters/:cluster. Most calls want that.
+        """
+        return "{u}{c}{p}".format(
+            u=self.config.url,
+            c='/clusters/' + self.config.cluster if cluster else '',
+            p=path
+        )
 
     def setClusterName(self):
         """
@@ -25,7 +175,7 @@ class Api():
         Otherwise bails out.
         """
         if self.config.cluster is None:
-            clusters = self.call('/clusters', cluster=False)
+            clusters = self.call('/clusters', cluster=False, fields=CLUSTER_FIELDS)
 
             if len(clusters['items']) != 1:
                 raise ClusterNotFound(
@@ -35,133 +185,309 @@ class Api():
             else:
                 self.config.cluster = clusters['items'][0]['Clusters']['cluster_name']
 
-    # This lru_cache is moslty to not pollute debug
-    @functools.lru_cache(maxsize=128)
     def getConfigValue(self, pset, key):
         """
         Return the value of the config `key` from property set `pset`
         """
-        tag = self.getTagFor(pset)
-        confurl = '/configurations?type={type}&tag={tag}'.format(
-            type=pset,
-            tag=tag
-        )
-        configs = self.call(confurl)
-        try:
-            v = configs['items'][0]['properties'][key]
-        except KeyError:
-            logging.error(
-                "Could not find {}/{}. Still returns 0 to carry on with script."
-                .format(pset, key)
-            )
-            return 'NOT FOUND'
+        return self.snapshot.get(pset, key)
 
-        try:
-            # If we have a number, cast it
-            v = int(v)
-        except ValueError:
-            pass
-
-        logging.info("{p}/{k}={v}".format(p=pset, k=key, v=v))
-        return v
+    def getDesiredConfigs(self):
+        """
+        Get latest config version of all property sets, as pset => {tag, ...}
+        """
+        return self.call('', fields=DESIRED_CONFIGS_FIELDS)['Clusters']['desired_configs']
 
     def getTagFor(self, pset):
         """
         Get latest config version for property set pset.
         """
-        tags = self.call('?fields=Clusters/desired_configs')
-        return tags['Clusters']['desired_configs'][pset]['tag']
+        return self.getDesiredConfigs()[pset]['tag']
 
-    @functools.lru_cache(maxsize=128)
-    def call(self, path, cluster=True):
+    def call(self, path, cluster=True, fields=None):
         """
         Call path in param, returns json'ised object.
         If cluster=True, prefixes path with /clusters/:cluster. Most calls want that.
+        If fields (a tuple, eg. ('Hosts/cpu_count',)) is given, ambari only
+        returns those, instead of whole resources.
+        Responses are cached, see `ResponseCache`, and `fetch` for an uncached call.
         """
-        url = "{u}{c}{p}".format(
-            u=self.config.url,
-            c='/clusters/' + self.config.cluster if cluster else '',
-            p=path
-        )
-        headers = {
-            'X-Requested-By': 'ambari'
-        }
-        auth = requests.auth.HTTPBasicAuth(self.config.user, self.config.pwd)
+        key = (path, cluster, fields)
+        jsonresp = self.responses.get(key)
+        if jsonresp is None:
+            jsonresp = self.fetch(path, cluster, fields)
+            self.responses.put(key, jsonresp)
+        else:
+            self.metrics.record('GET', self.url(path, cluster)[len(self.config.url):], source='cache')
+        return jsonresp
 
-        try:
-            r = requests.get(url, headers=headers, auth=auth)
-        except requests.exceptions.ConnectionError as e:
-            raise AmbariNotReachable("Could not connect to {u}: {e}".format(
-                u=self.config.url,
-                e=e
-            ))
+    def fetch(self, path, cluster=True, fields=None):
+        """
+        Same as `call`, always asking ambari.
+        """
+        if fields:
+            path = '{p}{s}fields={f}'.format(p=path, s='&' if '?' in path else '?', f=','.join(fields))
+        url = self.url(path, cluster)
+        # Recordings do not depend on where ambari lives.
+        key = url[len(self.config.url):]
+        if self.replayer:
+            jsonresp = self.replayer.get(key)
+            self.metrics.record('GET', key, source='replay')
+        else:
+            jsonresp = self.get(url)
 
-        jsonresp = r.json()
-        if self.config.apiLogging:
+        if self.recorder:
+            self.recorder.add(key, jsonresp)
+        # Formatting big responses costs more than getting them.
+        if self.config.apiLogging and logging.getLogger().isEnabledFor(logging.DEBUG):
             logging.debug(pp.pformat(jsonresp))
         return jsonresp
 
-    def put(self, path, data, cluster=True):
+    def get(self, url):
         """
+        GET url, returns json'ised response.
+        Being idempotent, it is retried on connection errors, timeouts and
+        server errors, waiting a random time up to backoff * 2^attempt
+        between attempts so that many clients do not retry all at once.
         """
-        url = "{u}{c}{p}".format(
-            u=self.config.url,
-            c='/clusters/' + self.config.cluster if cluster else '',
-            p=path
+        attempt = 0
+        while True:
+            try:
+                return self.request('GET', url)
+            except (AmbariNotReachable, ServerError) as e:
+                # No point in waiting for a circuit which opened.
+                if attempt >= self.config.retries or self.breaker.openUntil:
+                    raise
+                delay = random.uniform(0, self.config.backoff * 2 ** attempt)
+                logging.warning("{e}, retrying in {d:.1f}s.".format(e=e.message, d=delay))
+                time.sleep(delay)
+                attempt += 1
+
+    def request(self, method, url, data=None):
+        """
+        One http call to ambari, through the circuit breaker.
+        Returns json'ised response if any.
+        """
+        self.breaker.check()
+        path = url[len(self.config.url):]
+        start = time.perf_counter()
+        try:
+            r = self.session.request(
+                method,
+                url,
+                data=data,
+                timeout=(self.config.connectTimeout, self.config.timeout)
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.metrics.record(method, path, seconds=time.perf_counter() - start)
+            self.breaker.failure()
+            raise AmbariNotReachable("Could not {m} {u}: {e}".format(m=method, u=url, e=e))
+        self.metrics.record(
+            method,
+            path,
+            r.status_code,
+            time.perf_counter() - start,
+            # What went over the wire, compressed or not.
+            int(r.headers.get('Content-Length', len(r.content)))
         )
-        headers = {
-            'X-Requested-By': 'ambari',
-        }
-        auth = requests.auth.HTTPBasicAuth(self.config.user, self.config.pwd)
+        if r.status_code >= 500:
+            self.breaker.failure()
+            raise ServerError("{m} {u} returned {s}: {t}".format(
+                m=method,
+                u=url,
+                s=r.status_code,
+                t=r.text[:200]
+            ))
+        self.breaker.success()
+
+        if r.status_code >= 400:
+            raise ClientError("{m} {u} returned {s}: {t}".format(
+                m=method,
+                u=url,
+                s=r.status_code,
+                t=self.errorMessage(r)
+            ), r.status_code)
+        if not r.content and method != 'GET':
+            return None
         try:
-            r = requests.put(url, headers=headers, auth=auth, data=json.dumps(data))
-        except requests.exceptions.ConnectionError as e:
-            raise AmbariNotReachable("Could not connect to {u}: {e}".format(
-                u=self.config.url,
-                e=e
+            return r.json()
+        except ValueError:
+            raise BadResponse("{m} {u} did not return json: {t}".format(
+                m=method,
+                u=url,
+                t=r.text[:200]
             ))
-        # Will exception out on non success.
+
+    def errorMessage(self, r):
+        """
+        What ambari says went wrong in response r: the message of its json
+        error body, else the start of the body.
+        """
+        try:
+            return r.json()['message']
+        except (ValueError, KeyError, TypeError):
+            return r.text[:200]
+
+    def put(self, path, data, cluster=True):
+        """
+        Put json'ised data to path. See `call` for the meaning of cluster.
+        """
+        return self.send('PUT', path, data, cluster)
+
+    def post(self, path, data, cluster=True):
+        """
+        Post json'ised data to path. See `call` for the meaning of cluster.
+        """
+        return self.send('POST', path, data, cluster)
+
+    def send(self, method, path, data, cluster=True):
+        """
+        Send json'ised data to path, returns json'ised response if any.
+        """
+        if self.replayer:
+            logging.warning("Replaying, not sending {m} {p}.".format(m=method, p=path or '/'))
+            return None
         # Note success is loosely defined: passing a string which can be parsed
         # as valid complete JSON up to a point will give a 200 code, even if the
         # data cannot be used to do an actual update, or if there is rubbish after
         # a complete json (ie. "[]boom" is seen as valid).
-        r.raise_for_status()
+        try:
+            return self.request(method, self.url(path, cluster), json.dumps(data))
+        finally:
+            # Even a failed change may have been partly done.
+            self.responses.invalidate()
 
-    def getDNInfo(self):
+    def getDNInfo(self, fresh=False):
         """
         Count memory and cpu of DATANODES only.
+        Fetched once per Api (again if fresh), with as few calls as possible.
+
+        returns a HostInventory (hostnames => {cpu, mem})
+        """
+        inventory = self.knownDNInfo(fresh)
+        if inventory is None:
+            inventory = self.setDNInfo(self.iterDNs())
+        return inventory
+
+    def knownDNInfo(self, fresh=False):
+        """
+        The DN inventory if it does not need to be fetched (already
+        fetched, or in the disk cache and not fresh), else None.
+        """
+        if fresh:
+            self.dnInfo = None
+        if self.dnInfo is None and self.diskCache and not fresh:
+            cached = self.diskCache.getHosts()
+            if cached is not None:
+                self.dnInfo = HostInventory.fromDict(cached)
+        return self.dnInfo
+
+    def setDNInfo(self, dns):
+        """
+        Keep DNs dns, (hostname, {cpu, mem, rack}) pairs, as the inventory,
+        also on disk. Returns it.
+        """
+        inventory = HostInventory()
+        for name, resources in dns:
+            inventory.add(name, resources)
+        self.dnInfo = inventory
+        if self.diskCache:
+            self.diskCache.putHosts(inventory.toDict())
+        return inventory
 
-        returns a dict of hostnames => {cpu, mem}
+    def iterDNs(self):
         """
-        hosts = [
+        Yield (hostname, {cpu, mem, rack}) of all DNs, with only the fields we
+        need, one page at a time. Pages are not cached, so only one of
+        them is in memory at a time.
+
+        Ambari not honouring paging answers all DNs on each page: paging
+        stops at the last DN ambari says there is, at a page bigger than
+        asked for, or at a page bringing no new DN.
+        """
+        start = 0
+        seen = set()
+        while True:
+            try:
+                page, total = self.getDNPage(start)
+            except ClientError as e:
+                if start or e.status not in PAGING_UNSUPPORTED:
+                    raise
+                logging.warning(
+                    "Could not get DN info in bulk ({e}), falling back to one call per host."
+                    .format(e=e.message)
+                )
+                yield from self.iterDNsPerHost()
+                return
+            new = [(name, resources) for name, resources in page.items() if name not in seen]
+            if not new:
+                return
+            seen.update(name for name, _ in new)
+            yield from new
+            start += self.config.pageSize
+            if len(page) != self.config.pageSize or (total is not None and start >= total):
+                return
+
+    def getDNPage(self, start):
+        """
+        One page of DNs, from the start'th one, as (hostname => {cpu, mem,
+        rack}, number of DNs ambari says there are, None if it does not).
+        """
+        page = self.fetch(
+            '/hosts?host_components/HostRoles/component_name=DATANODE'
+            '&from={f}&page_size={s}'.format(f=start, s=self.config.pageSize),
+            fields=HOST_FIELDS
+        )
+        info = {}
+        for item in page['items']:
+            info[item['Hosts']['host_name']] = self.getHostResources(item)
+        total = page.get('itemTotal')
+        return info, None if total is None else int(total)
+
+    def getHostResources(self, host):
+        """
+        {cpu, mem, rack} out of a host as returned by ambari.
+        """
+        return {
+            'cpu': host['Hosts']['cpu_count'],
+            'mem': host['Hosts']['total_mem'] * 1024,  # In bloody kb!!
+            'rack': host['Hosts'].get('rack_info'),
+        }
+
+    def getDNHosts(self):
+        """
+        Names of all DNs.
+        """
+        return [
             x['HostRoles']['host_name']
-            for x in self.call('/components/DATANODE')['host_components']
+            for x in self.call('/components/DATANODE', fields=COMPONENT_HOSTS_FIELDS)['host_components']
             if x['HostRoles']['cluster_name'] == self.config.cluster
         ]
-        # I am trying very hard to be nice on the reviewer and
-        # not nest list comprehensions.
-        info = {}
-        for h in hosts:
-            host = self.call('/hosts/{h}'.format(h=h))
-            info[h] = {
-                'cpu': host['Hosts']['cpu_count'],
-                'mem': host['Hosts']['total_mem'] * 1024  # In bloody kb!!
-            }
-        return info
+
+    def iterDNsPerHost(self):
+        """
+        Get DNs one host at a time, for ambari not understanding the paged
+        query. Still calls up to poolSize hosts concurrently.
+        """
+        hosts = self.getDNHosts()
+        with ThreadPoolExecutor(max_workers=self.config.poolSize) as pool:
+            yield from zip(hosts, pool.map(self.getHost, hosts))
+
+    def getHost(self, host):
+        """
+        {cpu, mem, rack} of one host. Not cached: callers keep what they need.
+        """
+        return self.getHostResources(self.fetch('/hosts/{h}'.format(h=host), fields=HOST_FIELDS))
 
     def getTotalDNResources(self):
         """
-        Returns dict {mem, cpu} for all DNs.
+        Returns dict {mem, cpu, disk} for all DNs.
         """
-        totals = functools.reduce(
-            lambda x, y: {
-                'mem': x['mem'] + y['mem'],
-                'cpu': x['cpu'] + y['cpu'],
-            },
-            self.getDNInfo().values(),
-            {'mem': 0, 'cpu': 0}
-        )
-        totals['disk'] = len(self.getConfigValue("hdfs-site", "dfs.datanode.data.dir").split(',')) * len(self.getDNInfo())
+        hosts = self.getDNInfo()
+        totals = {
+            'mem': hosts.sum('mem'),
+            'cpu': hosts.sum('cpu'),
+            'disk': len(self.getConfigValue("hdfs-site", "dfs.datanode.data.dir").split(',')) * len(hosts),
+        }
         self.totalMem = totals['mem']
         self.totalCPU = totals['cpu']
         return totals
@@ -171,33 +497,64 @@ class Api():
         Nicely display some info about hosts.
         """
         print("DN resources:")
-        pp.pprint(self.getDNInfo())
+        pp.pprint(self.getDNInfo().toDict())
         print("Total resources:")
         pp.pprint(self.getTotalDNResources())
+        print("Hardware classes (cpu, mem) => DNs:")
+        pp.pprint({k: len(v) for k, v in self.getDNInfo().groupBy('cpu', 'mem').items()})
 
-    def update(self, pset, configs):
+    def update(self, toupdate, tags=None):
         """
+        Update all property sets of toupdate (pset => configs) in one PUT,
+        so that ambari makes one change instead of one per pset.
         Follows steps at https://cwiki.apache.org/confluence/display/AMBARI/Modify+configurations
+
+        Current tags and properties are read from ambari, not from the cache.
+        If tags (pset => tag the changes were worked out from) is given and
+        one of them moved since, nothing is updated and ConfigConflict is raised.
+        Property sets ambari does not have are not created, only reported.
+        Returns the property sets updated.
         """
-        desired_configs = self.call('?fields=Clusters/desired_configs')
-        tag = desired_configs['Clusters']['desired_configs'][pset]['tag']
+        if self.replayer:
+            logging.warning("Replaying, not updating {}.".format(', '.join(sorted(toupdate))))
+            return set()
 
-        current_config = self.call("/configurations?type={pset}&tag={tag}".format(
-            pset=pset,
-            tag=tag
-        ))
-        properties = current_config['items'][0]['properties']
-        properties.update(configs)
+        desired = self.fetch('', fields=DESIRED_CONFIGS_FIELDS)['Clusters']['desired_configs']
+        current = {pset: desired[pset]['tag'] for pset in toupdate if pset in desired}
+        missing = sorted(set(toupdate) - set(current))
+        if missing:
+            logging.warning("{} not in ambari, not updating them.".format(', '.join(missing)))
+        if not current:
+            return set()
+        if tags is not None:
+            moved = [pset for pset in sorted(current) if tags.get(pset) != current[pset]]
+            if moved:
+                raise ConfigConflict(
+                    "{} changed in ambari since they were read, not updating anything."
+                    .format(', '.join(moved))
+                )
 
-        self.put('', [{
-            'Clusters': {
-                'desired_configs': {
-                    'type': pset,
-                    'tag': 'version' + str(int(time.time() * 1000000)),
-                    'properties': properties,
-                    'service_config_version_note': 'Updated via a wondrous script.'
-                }
-            }
-        }])
+        properties = {
+            item['type']: dict(item['properties'])
+            for item in self.snapshot.fetch(sorted(current.items()), fresh=True)
+        }
+        tag = self.newTag()
+        items = []
+        for pset in sorted(current):
+            items.append({
+                'type': pset,
+                'tag': tag,
+                'properties': dict(properties.get(pset, {}), **toupdate[pset]),
+                'service_config_version_note': 'Updated via a wondrous script.'
+            })
 
+        self.put('', [{'Clusters': {'desired_configs': items}}])
+        # What was just set is the live config now.
+        self.snapshot.store(items)
+        return set(current)
 
+    def newTag(self):
+        """
+        Tag for a new config version.
+        """
+        return 'version' + str(int(time.time() * 1000000))
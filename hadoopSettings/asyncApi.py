@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+from hadoopSettings.ambariApi import (Api, PAGING_UNSUPPORTED)
+from hadoopSettings.exceptions import ClientError
+
+
+class AsyncApi():
+    """
+    Same methods as Api, as coroutines which can run concurrently.
+
+    Calls go through the pooled session of an Api, in threads, and at most
+    config.poolSize of them are in flight at the same time. Create it with
+    `await AsyncApi.connect(config)`.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.config = api.config
+        self.semaphore = asyncio.Semaphore(api.config.poolSize)
+
+    @classmethod
+    async def connect(cls, config):
+        """
+        Build the underlying Api (which already talks to ambari to find
+        the cluster name) without blocking the loop.
+        """
+        api = await asyncio.get_running_loop().run_in_executor(None, Api, config)
+        return cls(api)
+
+    def close(self):
+        self.api.close()
+
+    async def run(self, f, *args):
+        """
+        Run blocking f(*args) in a thread, once a slot is free.
+        """
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(None, f, *args)
+
+    async def call(self, path, cluster=True, fields=None):
+        """
+        See Api.call
+        """
+        return await self.run(self.api.call, path, cluster, fields)
+
+    async def loadConfigs(self, psets=None):
+        """
+        Load property sets `psets` (all of them if None) in the snapshot,
+        fetching all batches concurrently.
+        """
+        snapshot = self.api.snapshot
+        batches = await self.run(snapshot.plan, psets)
+        for items in await asyncio.gather(*[self.run(snapshot.fetch, b) for b in batches]):
+            snapshot.store(items)
+
+    async def getConfigValue(self, pset, key):
+        """
+        See Api.getConfigValue
+        """
+        if pset not in self.api.snapshot.tags:
+            await self.loadConfigs([pset])
+        return self.api.getConfigValue(pset, key)
+
+    async def getDNInfo(self):
+        """
+        See Api.getDNInfo. Once the first page tells how many DNs there
+        are, the other pages (or hosts, for ambari without paged queries)
+        are fetched concurrently.
+        """
+        api = self.api
+        known = api.knownDNInfo()
+        if known is not None:
+            return known
+
+        try:
+            first, total = await self.run(api.getDNPage, 0)
+        except ClientError as e:
+            if e.status not in PAGING_UNSUPPORTED:
+                raise
+            logging.warning(
+                "Could not get DN info in bulk ({e}), falling back to one call per host."
+                .format(e=e.message)
+            )
+            hosts = await self.run(api.getDNHosts)
+            found = await asyncio.gather(*[self.run(api.getHost, h) for h in hosts])
+            return api.setDNInfo(zip(hosts, found))
+
+        pageSize = self.config.pageSize
+        if len(first) == pageSize and total is None:
+            # No telling how many pages there are, see Api.iterDNs
+            return await self.run(api.getDNInfo)
+        pages = [first]
+        if len(first) == pageSize:
+            # More than one page, and ambari honours paging.
+            pages += [page for page, _ in await asyncio.gather(*[
+                self.run(api.getDNPage, start) for start in range(pageSize, total, pageSize)
+            ])]
+        return api.setDNInfo(item for page in pages for item in page.items())
+
+    async def update(self, toupdate, tags=None):
+        """
+        See Api.update: all psets of toupdate (pset => configs) go in one
+        call, there is nothing left to run concurrently.
+        """
+        return await self.run(self.api.update, toupdate, tags)
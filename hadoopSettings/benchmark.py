@@ -0,0 +1,183 @@
+"""
+Measure the whole pipeline (Api, Compute, rules) against fake ambari
+clusters of various sizes, see fakeAmbari, and compare with a baseline.
+"""
+import json
+import multiprocessing
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from hadoopSettings.compute import MB
+from hadoopSettings.config import Config
+from hadoopSettings import fakeAmbari
+from hadoopSettings.report import evaluate
+
+# Measures compared with the baseline.
+MEASURES = ['seconds', 'requests', 'bytes', 'peakMB']
+
+# Milliseconds the script may spend importing modules before --help answers.
+STARTUP_BUDGET = 30
+
+# Modules --help must not import.
+HEAVY = ['requests', 'urllib3', 'pprint', 'hadoopSettings.ambariApi']
+
+
+def serve(nodes, latency, conn):
+    server = fakeAmbari.serve(fakeAmbari.Cluster(nodes, latency=latency))
+    conn.send(server.server_address[1])
+    threading.Event().wait()
+
+
+def startServer(nodes, latency):
+    """
+    Fake ambari in its own process, so that it shares neither the GIL nor
+    the memory of what is measured. Returns (process, port).
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=serve, args=(nodes, latency, child), daemon=True)
+    process.start()
+    return process, parent.recv()
+
+
+def runPipeline(args):
+    """
+    What settings.py does, without displaying anything nor updating.
+    Returns the Metrics of the run.
+    """
+    with evaluate(Config(args)) as report:
+        return report.api.metrics
+
+
+def scenario(nodes, latency):
+    return '{n} nodes, {l:g}ms'.format(n=nodes, l=latency * 1000)
+
+
+def measure(nodes, latency=0, repeat=3, args=()):
+    """
+    Run the pipeline against a fake cluster of nodes data nodes, answering
+    after latency seconds. Time is the best of repeat runs, peak memory
+    (of python allocations) is measured in another run.
+    """
+    process, port = startServer(nodes, latency)
+    argv = list(args) + ['127.0.0.1', '--port', str(port)]
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            metrics = runPipeline(argv)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        runPipeline(argv)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        process.terminate()
+
+    calls = [c for c in metrics.calls if c['source'] == 'ambari']
+    return {
+        'scenario': scenario(nodes, latency),
+        'seconds': min(times),
+        'requests': len(calls),
+        'bytes': sum(c['bytes'] for c in calls),
+        'peakMB': peak / MB,
+    }
+
+
+def loadBaseline(path):
+    """
+    scenario => measures, empty if there is no baseline yet.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def saveBaseline(results, path):
+    baseline = loadBaseline(path)
+    for r in results:
+        baseline[r['scenario']] = {m: r[m] for m in MEASURES}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def report(results, baseline):
+    """
+    One line per scenario, with the change from the baseline if it has it.
+    """
+    lines = ["{s:24} {t:>9} {r:>9} {b:>12} {p:>9}".format(
+        s='scenario', t='seconds', r='requests', b='bytes', p='peak MB'
+    )]
+    for r in results:
+        lines.append("{scenario:24} {seconds:9.3f} {requests:9d} {bytes:12d} {peakMB:9.1f}".format(**r))
+        base = baseline.get(r['scenario'])
+        if base:
+            lines.append("{s:24} {changes}".format(s='  vs baseline', changes=' '.join(
+                "{c:>{w}}".format(c=change(base[m], r[m]), w=w)
+                for m, w in zip(MEASURES, [9, 9, 12, 9])
+            )))
+    return "\n".join(lines)
+
+
+def change(before, after):
+    if not before:
+        return 'n/a'
+    return "{:+.0%}".format(after / before - 1)
+
+
+def importTimes(stderr):
+    """
+    Modules imported after python's own startup (site), from the output
+    of python -X importtime, as a list of (name, depth, cumulative us).
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(cumulative)))
+        if name.strip() == 'site' and depth == 0:
+            modules = []
+    return modules
+
+
+def startup(script, repeat=5, budget=STARTUP_BUDGET):
+    """
+    Time `script --help` takes importing modules, best of repeat runs, in
+    ms, as {scenario, ms, budget, heavy (modules it should not import), ok}
+    """
+    best = None
+    for _ in range(repeat):
+        run = subprocess.run(
+            [sys.executable, '-X', 'importtime', script, '--help'],
+            capture_output=True, text=True, check=True
+        )
+        modules = importTimes(run.stderr)
+        ms = sum(cumulative for _, depth, cumulative in modules if depth == 0) / 1000
+        if best is None or ms < best:
+            best = ms
+    heavy = sorted({name for name, _, _ in modules} & set(HEAVY))
+    return {
+        'scenario': '{} --help'.format(script),
+        'ms': best,
+        'budget': budget,
+        'heavy': heavy,
+        'ok': best <= budget and not heavy,
+    }
+
+
+def startupReport(result):
+    return "{s:24} {ms:6.1f}ms of imports (budget {b:g}ms){h}: {status}".format(
+        s=result['scenario'],
+        ms=result['ms'],
+        b=result['budget'],
+        h=", imports {}".format(', '.join(result['heavy'])) if result['heavy'] else '',
+        status='ok' if result['ok'] else 'TOO SLOW'
+    )
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from hadoopSettings.exceptions import AmbariNotReachable
+
+
+class CircuitBreaker():
+    """
+    Fail fast when ambari keeps failing: after `threshold` failures in a
+    row, calls are refused for `cooldown` seconds. The first call after
+    that is let through, and opens the circuit again if it fails.
+
+    There is one breaker per ambari server, see `forServer`.
+    """
+
+    # name => breaker
+    breakers = {}
+    breakersLock = threading.Lock()
+
+    @classmethod
+    def forServer(cls, name, threshold, cooldown):
+        """
+        The breaker of server name, shared by all clusters it manages.
+        """
+        with cls.breakersLock:
+            if name not in cls.breakers:
+                cls.breakers[name] = cls(name, threshold, cooldown)
+            return cls.breakers[name]
+
+    def __init__(self, name, threshold, cooldown):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        # Time before which calls are refused.
+        self.openUntil = 0
+        # Guards failures and openUntil.
+        self.lock = threading.Lock()
+
+    def check(self):
+        """
+        Raise AmbariNotReachable if the circuit is open.
+        """
+        with self.lock:
+            wait = self.openUntil - time.monotonic()
+        if wait > 0:
+            raise AmbariNotReachable(
+                "{n} failed {f} times in a row, not calling it for {w:.0f}s."
+                .format(n=self.name, f=self.failures, w=wait)
+            )
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.openUntil = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.openUntil = time.monotonic() + self.cooldown
@@ -0,0 +1,103 @@
+"""
+The settings.py command, also run by `python -m hadoopSettings`.
+
+Only the standard library and Config are imported up front, the rest
+(requests among others) once arguments are parsed, so that --help and
+argument errors come back at once.
+"""
+import sys
+
+from hadoopSettings.config import Config
+
+
+def main(args=None):
+    """
+    Evaluate the cluster, display results, then update, restart and watch
+    as asked. args are the command line arguments, sys.argv's if None.
+    """
+    config = Config(args)
+
+    from hadoopSettings.results import RENDERERS
+
+    stdout = sys.stdout
+    renderer = RENDERERS[config.format](stdout)
+    if config.format != 'text':
+        # Only results go to stdout, the rest is for humans.
+        sys.stdout = sys.stderr
+    try:
+        run(config, renderer)
+    finally:
+        sys.stdout = stdout
+
+
+def run(config, renderer):
+    """
+    What main does once results have somewhere to go: the api is closed
+    (and --record saved) even when updating or restarting fails.
+    """
+    import cProfile
+
+    if config.cprofile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    from hadoopSettings.report import evaluate
+
+    with evaluate(config, write=renderer.write) as report:
+        api, c = report.api, report.c
+        if config.hostGroups:
+            from hadoopSettings.groups import HostGroups
+            with api.metrics.span('host groups'):
+                groups = HostGroups(api, c, config.hostGroups)
+            print("\n".join(groups.report()))
+
+        if config.update and api.replayer:
+            print("Replaying, will not update anything in ambari.")
+        elif config.update:
+            # Property sets changed, to know what to restart.
+            updated = c.do_update()
+            if config.hostGroups and groups.apply():
+                updated.add('yarn-site')
+            if updated and config.restart:
+                from hadoopSettings.restart import Restart
+                with api.metrics.span('restart'):
+                    restart = Restart(
+                        api, config.restartBatchSize, config.restartTolerance, config.restartTimeout
+                    )
+                    if restart.stale:
+                        restart.run()
+                if restart.stale:
+                    print("Update and restarts done.")
+                else:
+                    print("Update done, nothing to restart.")
+            elif updated:
+                print("Update done, but you need to restart the services yourself via the web UI.")
+            else:
+                print("There was no update that could be done.")
+        else:
+            print("Will not update the unexpected parameters without --update.")
+
+        if config.watch is not None:
+            from hadoopSettings.exporter import Exporter
+            from hadoopSettings.watch import Watcher
+            exporter = None
+            if config.exporterPort is not None:
+                exporter = Exporter(config, api)
+                exporter.publish(c)
+                exporter.start(config.exporterPort)
+            try:
+                Watcher(config, api, report.ruleset, c, renderer, exporter).run()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if exporter is not None:
+                    exporter.stop()
+
+    if config.cprofile:
+        profiler.disable()
+        profiler.dump_stats(config.cprofile)
+    if config.profile:
+        print("\n".join(api.metrics.report()))
+        print(api.responses.report())
+    if config.profileJson:
+        api.metrics.dump(config.profileJson)
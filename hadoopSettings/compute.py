@@ -1,13 +1,13 @@
-# lru_cache will be used only to prevent printing out many times the
-# same debugging message.
-from functools import lru_cache
-import inspect
+import contextlib
+import functools
 import logging
 import math
 import pprint
 import re
 
 from hadoopSettings.exceptions import (InvalidValue)
+from hadoopSettings.graph import Graph
+from hadoopSettings.results import (Deferred, Result)
 
 KB = 1024
 MB = 1024 * KB
@@ -15,16 +15,174 @@ GB = 1024 * MB
 
 pp = pprint.PrettyPrinter(indent=2)
 
-class bcolor(object):
-    """Backgroud colors"""
-    OK_COL = '\033[92m'
-    NOK_COL = '\033[91m'
-    NOTBAD_COL = '\033[35m'
-    END_COL = '\033[0m'
+# How values are derived from each other. Each function gets the values
+# named by its arguments, see Compute.graph.
 
-    OK_CHAR = "\u2714"
-    NOK_CHAR = "\u2718"
-    NOTBAD_CHAR = "~"
+def numDNs(hosts):
+    """
+    Return number of datanodes in the cluster.
+    """
+    n = len(hosts)
+    logging.info("numDNs: " + str(n))
+    return n
+
+
+def memPerNode(totals, numDNs):
+    """
+    Get average actual memory per node in the cluster:
+    (sum memory / count nodes)
+    """
+    mpn = int(totals['mem'] / numDNs)
+    logging.info("memPerNode: {b} ({gb:.4f} GB)".format(
+        b=mpn,
+        gb=mpn / GB)
+    )
+    return mpn
+
+
+def cpuPerNode(totals, numDNs):
+    """
+    Get average actual cpu per node in the cluster:
+    (sum cpu / count nodes)
+    """
+    cpn = int(totals['cpu'] / numDNs)
+    logging.info("cpuPerNode: {b}".format(b=cpn))
+    return cpn
+
+
+# Reserved memory (GB) per node, by memory per node: up to 8GB => 1GB...
+RESERVED_MEM = [
+    (8 * GB, 1),
+    (24 * GB, 2),
+    (48 * GB, 4),
+    (64 * GB, 6),
+    (96 * GB, 8),
+    (128 * GB, 12),
+    (256 * GB, 24),
+    (512 * GB, 32),
+    (None, 64),
+]
+
+# Min container size (MB), by yarn memory per node: below 4GB => 256MB...
+# Coming from hortonworks documentation.
+MIN_CONTAINER_SIZE = [
+    (4 * GB, 256),
+    (8 * GB, 512),
+    (24 * GB, 1024),
+    (None, 2048),
+]
+
+
+def reservedMem(memPerNode):
+    """
+    Reserved memory, ie. what should NOT be used by yarn.
+    Not counting HBASE.
+    """
+    n = next(gb for upTo, gb in RESERVED_MEM if upTo is None or memPerNode <= upTo)
+    logging.info("reservedMem: {b} ({gb} GB)".format(
+        b=n * GB,
+        gb=n
+    ))
+    return n * GB
+
+
+def totalAvailableRam(totals, numDNs, reservedMem):
+    """
+    Ram available for yarn (ie. all - reserverd)
+    """
+    n = totals['mem'] - (numDNs * reservedMem)
+    logging.info("TotalAvailableRam = {b} ({gb:.4f} GB)".format(
+        b=n,
+        gb=n / GB
+    ))
+    return n
+
+
+def yarnMemPerNode(hosts):
+    """
+    Memory yarn can use on the smallest node.
+    """
+    return int(hosts.min('mem') * 0.75)
+
+
+def availableCores(hosts):
+    """
+    Cores yarn can use on the smallest node: all but one.
+    """
+    return hosts.min('cpu') - 1
+
+
+def minContainerSize(yarnMemPerNode):
+    """
+    Min allocated ram per container.
+    Initial thought was:
+    0.99 * self.yarnMemPerNode() / (self.cpuPerNode() - 1)
+    but this lead to yarn memory 99% used, with some idle CPUs.
+    """
+    mb = next(mb for below, mb in MIN_CONTAINER_SIZE if below is None or yarnMemPerNode < below)
+
+    logging.info("minContainerSize = {b} MB".format(
+        b=mb,
+    ))
+    return mb * MB
+
+
+def numContainers(containers, totals, totalAvailableRam, minContainerSize):
+    """
+    Number of total containers. Note that this is the basic for most ram
+    calculations, so can be overriden by a config option.
+    On a dev node, the number of containers would probably be
+    2 (because 1 disk only).
+    """
+
+    if containers is not None:
+        logging.info(
+            "Number of containers forced to " + str(containers)
+        )
+        return containers
+
+    n = math.ceil(min(
+        2 * totals['cpu'],
+        1.8 * totals['disk'],
+        totalAvailableRam / minContainerSize
+    ))
+    logging.info("numContainers = " + str(n))
+    return n
+
+
+def ramPerContainer(minContainerSize, totalAvailableRam, numContainers):
+    n = math.floor(max(
+        minContainerSize,
+        totalAvailableRam / numContainers
+    ))
+    logging.info("ramPerContainer = {b} ({gb:.3f} GB)".format(
+        b=n,
+        gb=n / GB
+    ))
+    return n
+
+
+def tezContainerSize(minContainerSizeMB):
+    """
+    In MB. Multiple of min container size.
+    """
+    return 2 * minContainerSizeMB * 2  # *2 for test
+
+
+# Derived values, and the values they are computed from.
+NODES = [
+    (numDNs, ['hosts']),
+    (memPerNode, ['totals', 'numDNs']),
+    (cpuPerNode, ['totals', 'numDNs']),
+    (reservedMem, ['memPerNode']),
+    (totalAvailableRam, ['totals', 'numDNs', 'reservedMem']),
+    (yarnMemPerNode, ['hosts']),
+    (availableCores, ['hosts']),
+    (minContainerSize, ['yarnMemPerNode']),
+    (numContainers, ['containers', 'totals', 'totalAvailableRam', 'minContainerSize']),
+    (ramPerContainer, ['minContainerSize', 'totalAvailableRam', 'numContainers']),
+    (tezContainerSize, ['minContainerSizeMB']),
+]
 
 
 class Compute():
@@ -35,6 +193,9 @@ class Compute():
     - mem
     - documentation:
         https://docs.hortonworks.com/HDPDocuments/HDP2/HDP-2.0.6.0/bk_installing_manually_book/content/rpm-chap1-11.html
+
+    Derived values live in `graph`: each is computed once, and again only
+    when an input it depends on (hosts, totals, containers) changes.
     """
 
     # Easier access to some vars.
@@ -43,97 +204,112 @@ class Compute():
     GB = GB
 
     api = None
-    hosts = None
-    totals = None
 
-    # Remember updates to apply them all together at the end.
-    # Ambari has no way to change just one setting,
-    # so bundling updates per group makes sense.
-    toupdate = {}
-    # Some params cannot be updated.
-    noupdate = {}
+    # Property sets Compute itself reads.
+    psets = ('hdfs-site', 'capacity-scheduler')
+
+    def __init__(self, config, api, psets=None):
+        """
+        psets are the property sets to prefetch, on top of the ones
+        Compute needs. All of them if None.
+        """
+        # Remember updates to apply them all together at the end.
+        # Ambari has no way to change just one setting,
+        # so bundling updates per group makes sense.
+        self.toupdate = {}
+        # Some params cannot be updated.
+        self.noupdate = {}
+        # (pset, key) => how close the live value is to the expected one, see expects.
+        self.drift = {}
+        # Deferred results, while planning only.
+        self.deferred = None
 
-    def __init__(self, config, api):
         self.config = config
         self.api = api
-        self.hosts = api.getDNInfo()
-        self.totals = api.getTotalDNResources()
-        logging.info("Total DNs: {}".format(len(self.hosts)))
-        logging.info("Total Mem: {b} ({gb:.4f} GB)".format(
-            b=self.totals['mem'],
-            gb=self.totals['mem'] / GB
-        ))
-        logging.info("Total CPU: {}".format(self.totals['cpu']))
-        logging.info("Total disks/server: {}".format(self.totals['disk']))
+        # Prefetch config values, so that evaluating does not hit ambari.
+        self.snapshot = api.snapshot
+        with api.metrics.span('compute: load configs'):
+            self.snapshot.load(None if psets is None else set(psets) | set(self.psets))
 
-    @lru_cache(maxsize=1)
-    def memPerNode(self):
+        self.graph = self.newGraph()
+        self.graph.input('qcapacity', self.qcapacity())
+        with api.metrics.span('compute: hosts'):
+            self.setHosts(api.getDNInfo(), api.getTotalDNResources())
+
+    def refresh(self, hostsChanged=False):
         """
-        Get average actual memory per node in the cluster:
-        (sum memory / count nodes)
+        Take the latest values of the inputs coming from ambari: queue
+        capacity, DNs (fetched again if hostsChanged) and their totals.
         """
-        mpn = int(self.totals['mem'] / self.numDNs())
-        logging.info("memPerNode: {b} ({gb:.4f} GB)".format(
-            b=mpn,
-            gb=mpn / GB)
-        )
-        return mpn
+        self.graph.input('qcapacity', self.qcapacity())
+        self.setHosts(self.api.getDNInfo(fresh=hostsChanged), self.api.getTotalDNResources())
 
-    @lru_cache(maxsize=1)
-    def cpuPerNode(self):
+    def newGraph(self):
         """
-        Get average actual cpu per node in the cluster:
-        (sum cpu / count nodes)
+        Graph of derived values, hosts and totals inputs still to be set.
         """
-        cpn = int(self.totals['cpu'] / self.numDNs())
-        logging.info("cpuPerNode: {b}".format(b=cpn))
-        return cpn
-
-    @lru_cache(maxsize=1)
-    def numDNs(self):
+        graph = Graph()
+        for function, deps in NODES:
+            graph.node(function.__name__, deps, function)
+        graph.node('minContainerSizeMB', ['minContainerSize'], lambda b: int(b / MB))
+        graph.node('ramPerContainerMB', ['ramPerContainer'], lambda b: int(b / MB))
+        graph.input('containers', self.config.containers)
+        return graph
+
+    def sizeFor(self, hosts):
         """
-        Return number of datanodes in the cluster.
+        Graph of derived values as if the cluster had only DNs `hosts`
+        (a subset of self.hosts). Useful for per node values of a group
+        of identical nodes.
         """
-        n = len(self.hosts)
-        logging.info("numDNs: " + str(n))
-        return n
-
-    @lru_cache(maxsize=1)
-    def reservedMem(self):
+        graph = self.newGraph()
+        graph.input('hosts', hosts)
+        graph.input('totals', {
+            'mem': hosts.sum('mem'),
+            'cpu': hosts.sum('cpu'),
+            'disk': self.totals['disk'] // self.numDNs() * len(hosts),
+        })
+        return graph
+
+    def setHosts(self, hosts, totals):
         """
-        Reserved memory, ie. what should NOT be used by yarn.
-        Not counting HBASE.
+        (Re)set the DNs everything is computed from: a HostInventory, and
+        its totals.
         """
-        memPerNode = self.memPerNode()
-
-        if memPerNode <= 8 * GB:
-            n = 1
-        elif memPerNode <= 24 * GB:
-            n = 2
-        elif memPerNode <= 48 * GB:
-            n = 4
-        elif memPerNode <= 64 * GB:
-            n = 6
-        elif memPerNode <= 96 * GB:
-            n = 8
-        elif memPerNode <= 128 * GB:
-            n = 12
-        elif memPerNode <= 256 * GB:
-            n = 24
-        elif memPerNode <= 512 * GB:
-            n = 32
-        else:
-            n = 64
-        logging.info("reservedMem: {b} ({gb} GB)".format(
-            b=n * GB,
-            gb=n
+        self.graph.input('hosts', hosts)
+        self.graph.input('totals', totals)
+        logging.info("Total DNs: {}".format(len(hosts)))
+        logging.info("Total Mem: {b} ({gb:.4f} GB)".format(
+            b=totals['mem'],
+            gb=totals['mem'] / GB
         ))
-        return n * GB
+        logging.info("Total CPU: {}".format(totals['cpu']))
+        logging.info("Total disks/server: {}".format(totals['disk']))
+
+    @property
+    def hosts(self):
+        return self.graph['hosts']
+
+    @property
+    def totals(self):
+        return self.graph['totals']
+
+    def memPerNode(self):
+        return self.graph['memPerNode']
+
+    def cpuPerNode(self):
+        return self.graph['cpuPerNode']
+
+    def numDNs(self):
+        return self.graph['numDNs']
+
+    def reservedMem(self):
+        return self.graph['reservedMem']
 
     def qcapacity(self):
         try:
             return int(
-                self.api.getConfigValue(
+                self.snapshot.get(
                     'capacity-scheduler',
                     'yarn.scheduler.capacity.root.default.capacity'
                 )
@@ -142,112 +318,67 @@ class Compute():
             # not an int
             return 1
 
-    @lru_cache(maxsize=1)
     def totalAvailableRam(self):
-        """
-        Ram available for yarn (ie. all - reserverd)
-        """
-        n = self.totals['mem'] - (self.numDNs() * self.reservedMem())
-        logging.info("TotalAvailableRam = {b} ({gb:.4f} GB)".format(
-            b=n,
-            gb=n / GB
-        ))
-        return n
+        return self.graph['totalAvailableRam']
 
-    @lru_cache(maxsize=1)
     def yarnMemPerNode(self):
-        dns = self.hosts
-        return int(min([dns[dn]['mem'] for dn in dns.keys()]) * 0.75)
+        return self.graph['yarnMemPerNode']
 
-    @lru_cache(maxsize=1)
     def minContainerSize(self):
-        """
-        Min allocated ram per container.
-        Initial thought was:
-        0.99 * self.yarnMemPerNode() / (self.cpuPerNode() - 1)
-        but this lead to yarn memory 99% used, with some idle CPUs.
-        """
+        return self.graph['minContainerSize']
 
-        # Coming from hortonworks documentation.
-        mem = self.yarnMemPerNode()
-        if mem < 4 * GB:
-            mb = 256
-        elif mem < 8 * GB:
-            mb = 512
-        elif mem < 24 * GB:
-            mb = 1024
-        else:
-            mb = 2048
+    def numContainers(self):
+        return self.graph['numContainers']
 
-        logging.info("minContainerSize = {b} MB".format(
-            b=mb,
-        ))
-        return mb * MB
+    def ramPerContainer(self):
+        return self.graph['ramPerContainer']
 
-    @lru_cache(maxsize=1)
-    def numContainers(self):
+    @contextlib.contextmanager
+    def planning(self):
         """
-        Number of total containers. Note that this is the basic for most ram
-        calculations, so can be overriden by a config option.
-        On a dev node, the number of containers would probably be
-        2 (because 1 disk only).
+        In the with block, expects and its shortcuts do not read live
+        values: they return Deferred results, and note which property
+        sets they need. Yields the list of them, see resolve.
         """
+        self.deferred = []
+        try:
+            yield self.deferred
+        finally:
+            self.deferred = None
 
-        if self.config.containers is not None:
-            logging.info(
-                "Number of containers forced to " + str(self.config.containers)
-            )
-            return self.config.containers
-
-        n = math.ceil(min(
-            2 * self.totals['cpu'],
-            1.8 * self.totals['disk'],
-            self.totalAvailableRam() / self.minContainerSize()
-        ))
-        logging.info("numContainers = " + str(n))
-        return n
-
-    @lru_cache(maxsize=1)
-    def ramPerContainer(self):
-        n = math.floor(max(
-            self.minContainerSize(),
-            self.totalAvailableRam() / self.numContainers()
-        ))
-        logging.info("ramPerContainer = {b} ({gb:.3f} GB)".format(
-            b=n,
-            gb=n / GB
-        ))
-        return n
+    def defer(self, pset, call):
+        deferred = Deferred(pset, call)
+        self.deferred.append(deferred)
+        return deferred
 
-    def getMark(self, about):
-        if about == 1:
-            return bcolor.OK_COL + bcolor.OK_CHAR + bcolor.END_COL
-        elif about > 0.95 and about < 1.05:
-            return bcolor.NOTBAD_COL + bcolor.NOTBAD_CHAR + bcolor.END_COL
-        else:
-            return bcolor.NOK_COL + bcolor.NOK_CHAR + bcolor.END_COL
+    def resolve(self, deferred):
+        """
+        Load the property sets deferred results need which are not loaded
+        yet, all at once, then complete them all.
+        """
+        missing = {d.pset for d in deferred if d.pset is not None and d.pset not in self.snapshot.tags}
+        if missing:
+            self.snapshot.load(missing)
+        for d in deferred:
+            d.resolve()
 
     def fyi(self, value, explanation):
         if self.config.tofix:
             return None
         else:
-            return("FYI - {value}: {expl}".format(
-                value=value,
-                expl=explanation
-            ))
+            return Result('fyi', value=value, description=explanation)
 
     def fyis(self, explanation):
         if self.config.tofix:
             return None
         else:
-            return("FYI - {expl}".format(
-                expl=explanation
-            ))
+            return Result('fyis', description=explanation)
 
     def expects(self, pset, config, expect, explanation="", value=None, update=None):
         """
-        Get live value from pset/config, compare it to expect and
-        display everything nicely.
+        Get live value from pset/config, compare it to expect, as a
+        Result (None if there is nothing to display). While planning, a
+        Deferred of it.
 
         If `value` is given in parameter, it is used instead of getting it
         live. It has probably been already gathered and somehow massaged.
@@ -263,7 +394,12 @@ class Compute():
         if pset is None and config is None:
             return self.fyi(expect, explanation)
 
-        workValue = self.api.getConfigValue(pset, config) if value is None else value
+        if self.deferred is not None and value is None:
+            return self.defer(pset, functools.partial(
+                self.expects, pset, config, expect, explanation, value, update
+            ))
+
+        workValue = self.snapshot.get(pset, config) if value is None else value
 
         # About represents how close we are to the expected value.
         if callable(expect):
@@ -273,19 +409,16 @@ class Compute():
             about = 0.99
         else:
             try:
-                # Get the difference in percentage of the expected workValue.
-                about = workValue / expect
+                if expect == 0:
+                    # Nothing to divide by: as expected, or not at all.
+                    about = 1 if workValue == 0 else 0
+                else:
+                    # Get the difference in percentage of the expected workValue.
+                    about = workValue / expect
             except TypeError:
                 # Not a number and booleans are actually string.
                 about = 1 if expect.strip() == workValue else 0
-
-        # expect_str is a human readable display of expect
-        if expect is None:
-            expect_str = 'No idea'
-        elif callable(expect):
-            expect_str = "'{}'".format(inspect.getsource(expect).strip().rstrip(','))
-        else:
-            expect_str = str(expect)
+        self.drift[(pset, config)] = about
 
         if about != 1:
             # We might need to update, see method heredoc for more info.
@@ -299,15 +432,7 @@ class Compute():
         # Always print unexpected data (about != 1).
         # The rest only if we do not want only data tofix.
         if about != 1 or not self.config.tofix:
-            return("{check} {pset}/{config} = {value}, expects {expect} {expl} {about}".format(
-                check=self.getMark(about),
-                pset=pset,
-                config=config,
-                value=workValue,
-                expect=expect_str,
-                expl="({})".format(explanation) if explanation else "",
-                about=" #{}%".format(int(100 * about))
-            ))
+            return Result('check', pset, config, workValue, expect, about, explanation)
         else:
             return None
 
@@ -345,9 +470,11 @@ class Compute():
         Lazy shortcut to match xmx values.
         Expect is then an int.
         """
+        if self.deferred is not None:
+            return self.defer(pset, functools.partial(self.expects_xmx, pset, config, expect, explanation))
 
         # cast to str to catch all cases (eg. int, None)
-        value = str(self.api.getConfigValue(pset, config))
+        value = str(self.snapshot.get(pset, config))
         pattern = '-Xmx(\d+)m'
         matches = re.search(pattern, value)
         if matches:
@@ -394,20 +521,27 @@ class Compute():
         if pset not in self.noupdate:
             self.noupdate[pset] = []
 
-        self.noupdate[pset].append(config)
+        # Rules can be evaluated again, see Watcher.
+        if config not in self.noupdate[pset]:
+            self.noupdate[pset].append(config)
 
     def do_update(self):
-
-        updates = False
-
+        """
+        Send the settings to update to ambari. Returns the property sets
+        updated.
+        """
         if self.noupdate:
             print("Cannot update:")
             pp.pprint(self.noupdate)
 
-        for pset, configs in self.toupdate.items():
-            print("Updating {pset} with:".format(pset=pset))
-            pp.pprint(configs)
-            self.api.update(pset, configs)
-            updates = True
+        if not self.toupdate:
+            return set()
+
+        # All at once, and only if nobody changed them since they were read.
+        with self.api.metrics.span('compute: update'):
+            updated = self.api.update(self.toupdate, self.snapshot.tags)
 
-        return updates
+        for pset in sorted(updated):
+            print("Updated {pset} with:".format(pset=pset))
+            pp.pprint(self.toupdate[pset])
+        return updated
@@ -13,6 +13,9 @@ class Config():
     # Display only tofix settings
     tofix = False
 
+    # How to write results: text, jsonl or csv
+    format = 'text'
+
     # Ambari user
     user = 'admin'
 
@@ -43,9 +46,94 @@ class Config():
     # Update config settings
     update = False
 
-    def __init__(self):
+    # Max number of kept alive connections to ambari
+    poolSize = 10
+
+    # Seconds to wait for ambari on each request
+    timeout = 60
+
+    # Seconds to wait for a connection to ambari
+    connectTimeout = 5
+
+    # Number of times a failed GET is retried
+    retries = 3
+
+    # Seconds to wait before the first retry, doubled for each next one
+    backoff = 0.5
+
+    # Number of failed calls in a row after which ambari is not called anymore
+    breakerThreshold = 5
+
+    # Seconds ambari is not called for then
+    breakerCooldown = 30
+
+    # Ask ambari for gzip'ed responses
+    gzip = True
+
+    # Number of hosts asked for per call
+    pageSize = 500
+
+    # Keep cluster state on disk between runs
+    cache = False
+
+    # Where to keep it
+    cacheDir = '~/.cache/ambariconfig'
+
+    # Seconds the DN inventory is kept on disk
+    hostTtl = 24 * 3600
+
+    # Number of ambari responses kept in memory
+    responseCacheSize = 128
+
+    # Seconds an ambari response is kept in memory
+    responseTtl = 300
+
+    # File to record all api responses to
+    record = None
+
+    # File to replay api responses from, instead of calling ambari
+    replay = None
+
+    # Only check rules about those property sets (all if None)
+    psets = None
+
+    # Only check rules about those services (all if None)
+    services = None
+
+    # Work out per node settings per group of hosts: hardware or ambari
+    hostGroups = None
+
+    # Restart stale components after an update
+    restart = False
+
+    # Number of hosts restarted at the same time
+    restartBatchSize = 10
+
+    # Number of restart batches which can fail before giving up
+    restartTolerance = 0
+
+    # Seconds to wait for a restart batch before counting it as failed
+    restartTimeout = 3600
+
+    # Display where the time went
+    profile = False
+
+    # File to save calls and spans to, as json
+    profileJson = None
+
+    # File to save cProfile stats to
+    cprofile = None
+
+    # Seconds between two checks of the cluster, in watch mode
+    watch = None
+
+    # Port to publish prometheus metrics on, in watch mode
+    exporterPort = None
+
+    def __init__(self, args=None):
         """
-        Initialise the parser and do its magic.
+        Initialise the parser and do its magic on args (command line
+        arguments if None).
         """
         parser = argparse.ArgumentParser(
             description='Work out yarn configuration settings.',
@@ -135,6 +223,15 @@ class Config():
             help='Only display values to fix.'
         )
 
+        parser.add_argument(
+            '--format',
+            dest='format',
+            choices=['text', 'jsonl', 'csv'],
+            default=self.format,
+            help='How to write results: text for a terminal, or one json object (jsonl) '
+            'or csv row per result, for programs. Other messages then go to stderr.'
+        )
+
         parser.add_argument(
             '--update',
             dest='update',
@@ -151,6 +248,246 @@ class Config():
             help='Configure llap.'
         )
 
+        parser.add_argument(
+            '--pool-size',
+            dest='poolSize',
+            type=int,
+            default=self.poolSize,
+            help='Max number of kept alive connections to ambari.'
+        )
+
+        parser.add_argument(
+            '--timeout',
+            dest='timeout',
+            type=float,
+            default=self.timeout,
+            help='Seconds to wait for ambari to answer each request.'
+        )
+
+        parser.add_argument(
+            '--connect-timeout',
+            dest='connectTimeout',
+            type=float,
+            default=self.connectTimeout,
+            help='Seconds to wait for a connection to ambari.'
+        )
+
+        parser.add_argument(
+            '--retries',
+            dest='retries',
+            type=int,
+            default=self.retries,
+            help='Number of times a failed read (connection error, timeout or '
+            'server error) is retried.'
+        )
+
+        parser.add_argument(
+            '--backoff',
+            dest='backoff',
+            type=float,
+            default=self.backoff,
+            help='Max seconds to wait before the first retry, doubled for each next one. '
+            'The actual wait is random, up to that.'
+        )
+
+        parser.add_argument(
+            '--breaker-threshold',
+            dest='breakerThreshold',
+            type=int,
+            default=self.breakerThreshold,
+            help='Number of failed calls in a row after which ambari is not called '
+            'for --breaker-cooldown seconds.'
+        )
+
+        parser.add_argument(
+            '--breaker-cooldown',
+            dest='breakerCooldown',
+            type=float,
+            default=self.breakerCooldown,
+            help='Seconds ambari is not called for once --breaker-threshold calls failed.'
+        )
+
+        parser.add_argument(
+            '--gzip', '--no-gzip',
+            dest='gzip',
+            action=BooleanAction,
+            default=self.gzip,
+            help='Ask ambari for gzip compressed responses.'
+        )
+
+        parser.add_argument(
+            '--page-size',
+            dest='pageSize',
+            type=int,
+            default=self.pageSize,
+            help='Number of hosts asked to ambari per call.'
+        )
+
+        parser.add_argument(
+            '--cache', '--no-cache',
+            dest='cache',
+            action=BooleanAction,
+            default=self.cache,
+            help='Keep hosts and property sets on disk between runs. Property sets '
+            'are only fetched again when their tag changed.'
+        )
+
+        parser.add_argument(
+            '--cache-dir',
+            dest='cacheDir',
+            type=str,
+            default=self.cacheDir,
+            help='Where to keep the cache, per ambari host and cluster.'
+        )
+
+        parser.add_argument(
+            '--host-ttl',
+            dest='hostTtl',
+            type=int,
+            default=self.hostTtl,
+            help='Seconds the DN inventory is kept in cache.'
+        )
+
+        parser.add_argument(
+            '--response-cache-size',
+            dest='responseCacheSize',
+            type=int,
+            default=self.responseCacheSize,
+            help='Number of ambari responses kept in memory, least recently used out first.'
+        )
+
+        parser.add_argument(
+            '--response-ttl',
+            dest='responseTtl',
+            type=float,
+            default=self.responseTtl,
+            help='Seconds an ambari response is kept in memory. Responses which may '
+            'have changed are also dropped after each change sent to ambari.'
+        )
+
+        parser.add_argument(
+            '--record',
+            dest='record',
+            type=str,
+            default=self.record,
+            help='Record all ambari responses to this file.'
+        )
+
+        parser.add_argument(
+            '--replay',
+            dest='replay',
+            type=str,
+            default=self.replay,
+            help='Replay ambari responses from a file saved with --record, '
+            'without calling ambari.'
+        )
+
+        parser.add_argument(
+            '--pset',
+            dest='psets',
+            action='append',
+            default=self.psets,
+            help='Only check this property set (eg. yarn-site). Can be repeated.'
+        )
+
+        parser.add_argument(
+            '--service',
+            dest='services',
+            action='append',
+            type=str.upper,
+            default=self.services,
+            help='Only check property sets of this service (eg. HIVE). Can be repeated.'
+        )
+
+        parser.add_argument(
+            '--host-groups',
+            dest='hostGroups',
+            choices=['hardware', 'ambari'],
+            default=self.hostGroups,
+            help='Work out per node yarn settings per group of data nodes: nodes with '
+            'the same hardware, or existing ambari YARN config groups. With --update, '
+            'config groups are created or updated accordingly.'
+        )
+
+        parser.add_argument(
+            '--restart',
+            dest='restart',
+            action='store_true',
+            default=self.restart,
+            help='After --update, restart the components ambari marks with stale configs, '
+            'in rolling batches of hosts.'
+        )
+
+        parser.add_argument(
+            '--restart-batch-size',
+            dest='restartBatchSize',
+            type=int,
+            default=self.restartBatchSize,
+            help='Number of hosts restarted at the same time.'
+        )
+
+        parser.add_argument(
+            '--restart-tolerance',
+            dest='restartTolerance',
+            type=int,
+            default=self.restartTolerance,
+            help='Number of restart batches which can fail before giving up.'
+        )
+
+        parser.add_argument(
+            '--restart-timeout',
+            dest='restartTimeout',
+            type=int,
+            default=self.restartTimeout,
+            metavar='SECONDS',
+            help='Seconds to wait for a restart batch to be done before counting it as failed.'
+        )
+
+        parser.add_argument(
+            '--profile',
+            dest='profile',
+            action='store_true',
+            default=self.profile,
+            help='Display time spent per step, the slowest ambari endpoints, and the '
+            'cache hit ratio.'
+        )
+
+        parser.add_argument(
+            '--profile-json',
+            dest='profileJson',
+            type=str,
+            default=self.profileJson,
+            help='Save all ambari calls and step timings to this file, as json.'
+        )
+
+        parser.add_argument(
+            '--cprofile',
+            dest='cprofile',
+            type=str,
+            default=self.cprofile,
+            help='Save cProfile stats of the run to this file (see pstats).'
+        )
+
+        parser.add_argument(
+            '--watch',
+            dest='watch',
+            type=float,
+            default=self.watch,
+            metavar='INTERVAL',
+            help='Keep running, checking every INTERVAL seconds for changed property '
+            'sets or data nodes, and display the rules evaluated again because of them.'
+        )
+
+        parser.add_argument(
+            '--exporter-port',
+            dest='exporterPort',
+            type=int,
+            default=self.exporterPort,
+            metavar='PORT',
+            help='In watch mode, publish drift of the settings, sizing values and '
+            'ambari latencies as prometheus metrics on http://0.0.0.0:PORT/metrics'
+        )
+
         # Positional
         parser.add_argument(
             dest='ambariHost',
@@ -160,7 +497,11 @@ class Config():
             help='Ambari host name.'
         )
 
-        parser.parse_args(namespace=self)
+        parser.parse_args(args, namespace=self)
+        if self.watch is not None and self.update:
+            parser.error('--watch cannot be used with --update.')
+        if self.exporterPort is not None and self.watch is None:
+            parser.error('--exporter-port needs --watch.')
 
         self.setLogging()
 
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import time
+
+
+class DiskCache():
+    """
+    Cluster state kept on disk between runs, under
+    <cacheDir>/<ambari host>/<cluster>/:
+    - hosts.json: DN inventory, trusted for hostTtl seconds.
+    - psets/<pset>.json: properties of a pset, trusted as long as its tag
+      is still the desired one.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.dir = os.path.join(
+            os.path.expanduser(config.cacheDir),
+            config.ambariHost,
+            config.cluster
+        )
+
+    def read(self, name):
+        try:
+            with open(os.path.join(self.dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent run never reads half a file.
+        tmp = '{p}.{pid}'.format(p=path, pid=os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def getHosts(self):
+        """
+        Cached DN inventory, or None if missing or older than hostTtl.
+        """
+        cached = self.read('hosts.json')
+        if cached is None or time.time() - cached['time'] > self.config.hostTtl:
+            return None
+        logging.info("DN info read from cache.")
+        return cached['hosts']
+
+    def putHosts(self, hosts):
+        self.write('hosts.json', {'time': time.time(), 'hosts': hosts})
+
+    def getPset(self, pset, tag):
+        """
+        Cached properties of pset, or None if not cached for this tag.
+        """
+        cached = self.read(os.path.join('psets', pset + '.json'))
+        if cached is None or cached['tag'] != tag:
+            return None
+        logging.info("{p} (tag {t}) read from cache.".format(p=pset, t=tag))
+        return cached['properties']
+
+    def putPset(self, pset, tag, properties):
+        self.write(
+            os.path.join('psets', pset + '.json'),
+            {'tag': tag, 'properties': properties}
+        )
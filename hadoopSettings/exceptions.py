@@ -28,3 +28,58 @@ class InvalidValue(Exception):
 
     def __init__(self, message):
         self.message = message
+
+
+class NotRecorded(Exception):
+    """
+    Replayed api call was not in the recording.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class ConfigConflict(Exception):
+    """
+    Config changed in ambari since it was read.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class RestartFailed(Exception):
+    """
+    Too many restart batches failed.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class BadResponse(Exception):
+    """
+    Ambari answered with a server error, or not with json.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class ServerError(BadResponse):
+    """
+    Ambari answered with a 5xx, worth retrying.
+    """
+
+
+class ClientError(BadResponse):
+    """
+    Ambari refused a call with a 4xx (eg. bad credentials, unknown
+    cluster), not worth retrying.
+    """
+
+    def __init__(self, message, status):
+        # Displayed as the others: message only.
+        Exception.__init__(self, message)
+        self.message = message
+        self.status = status
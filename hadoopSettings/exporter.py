@@ -0,0 +1,180 @@
+"""
+Prometheus exporter for watch mode: how far each setting is from what is
+expected, the sizing values derived from the cluster, and how long ambari
+takes to answer, served over http by the watching process itself.
+"""
+from http.server import (BaseHTTPRequestHandler, ThreadingHTTPServer)
+import logging
+import threading
+import time
+
+from hadoopSettings.metrics import BUCKETS
+
+# Derived values published, as graph node => (metric name, help).
+SIZING = {
+    'numDNs': ('ambariconfig_data_nodes', 'Number of data nodes.'),
+    'numContainers': ('ambariconfig_containers', 'Number of YARN containers the cluster can run.'),
+    'ramPerContainer': ('ambariconfig_container_memory_bytes', 'Memory of a YARN container.'),
+    'minContainerSize': ('ambariconfig_min_container_memory_bytes', 'Minimum memory of a YARN container.'),
+    'yarnMemPerNode': ('ambariconfig_node_yarn_memory_bytes', 'Memory YARN can use on each data node.'),
+    'availableCores': ('ambariconfig_node_yarn_cores', 'Cores YARN can use on each data node.'),
+}
+
+
+def label(value):
+    """
+    value escaped for a label, see the prometheus text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join('{k}="{v}"'.format(k=k, v=label(v)) for k, v in values.items()) + '}'
+
+
+class Exporter():
+    """
+    The watch loop publishes what Compute worked out after each evaluation,
+    scrapes only read the last published values (and the latency
+    histograms of api.metrics), so they never trigger calls to ambari nor
+    see a half done evaluation.
+    """
+
+    def __init__(self, config, api):
+        self.cluster = config.cluster
+        self.api = api
+        self.lock = threading.Lock()
+        # (pset, key) => about, see Compute.expects
+        self.drift = {}
+        # graph node => value
+        self.sizing = {}
+        self.evaluated = None
+        self.checked = None
+        self.server = None
+
+    def publish(self, c):
+        """
+        Take the values of the last evaluation by Compute c.
+        """
+        drift = dict(c.drift)
+        sizing = {name: c.graph[name] for name in SIZING}
+        with self.lock:
+            self.drift = drift
+            self.sizing = sizing
+            self.evaluated = time.time()
+            self.checked = self.evaluated
+
+    def check(self):
+        """
+        Note a check of the cluster, which found nothing new.
+        """
+        with self.lock:
+            self.checked = time.time()
+
+    def render(self):
+        """
+        All metrics, in the prometheus text format.
+        """
+        cluster = self.cluster
+        with self.lock:
+            drift = sorted(self.drift.items(), key=lambda x: (str(x[0][0]), str(x[0][1])))
+            sizing = dict(self.sizing)
+            times = [
+                ('ambariconfig_last_evaluation_timestamp_seconds', 'When rules were last evaluated.', self.evaluated),
+                ('ambariconfig_last_check_timestamp_seconds', 'When the cluster was last checked.', self.checked),
+            ]
+        with self.api.responses.lock:
+            cache = dict(self.api.responses.stats)
+        with self.api.metrics.lock:
+            latency = {key: dict(h, buckets=list(h['buckets'])) for key, h in self.api.metrics.latency.items()}
+
+        lines = [
+            '# HELP ambariconfig_drift_ratio Live value of a setting over the expected one, 1 when as expected.',
+            '# TYPE ambariconfig_drift_ratio gauge',
+        ]
+        for (pset, key), about in drift:
+            lines.append('ambariconfig_drift_ratio{l} {v!r}'.format(
+                l=labels(cluster=cluster, pset=pset, key=key), v=float(about)
+            ))
+        lines += [
+            '# HELP ambariconfig_settings_to_fix Number of settings not as expected.',
+            '# TYPE ambariconfig_settings_to_fix gauge',
+            'ambariconfig_settings_to_fix{l} {n}'.format(
+                l=labels(cluster=cluster), n=sum(1 for _, about in drift if about != 1)
+            ),
+        ]
+
+        for name, (metric, text) in SIZING.items():
+            if name not in sizing:
+                continue
+            lines += [
+                '# HELP {m} {h}'.format(m=metric, h=text),
+                '# TYPE {m} gauge'.format(m=metric),
+                '{m}{l} {v}'.format(m=metric, l=labels(cluster=cluster), v=sizing[name]),
+            ]
+
+        for metric, text, value in times:
+            if value is None:
+                continue
+            lines += [
+                '# HELP {m} {h}'.format(m=metric, h=text),
+                '# TYPE {m} gauge'.format(m=metric),
+                '{m}{l} {v:.3f}'.format(m=metric, l=labels(cluster=cluster), v=value),
+            ]
+
+        lines += [
+            '# HELP ambariconfig_response_cache_total Events of the in memory cache of ambari responses.',
+            '# TYPE ambariconfig_response_cache_total counter',
+        ]
+        for event, n in sorted(cache.items()):
+            lines.append('ambariconfig_response_cache_total{l} {n}'.format(l=labels(cluster=cluster, event=event), n=n))
+
+        lines += [
+            '# HELP ambariconfig_ambari_request_seconds Time ambari took to answer, per endpoint.',
+            '# TYPE ambariconfig_ambari_request_seconds histogram',
+        ]
+        for (method, path), histogram in sorted(latency.items()):
+            count = 0
+            for bound, n in zip(list(BUCKETS) + ['+Inf'], histogram['buckets']):
+                count += n
+                lines.append('ambariconfig_ambari_request_seconds_bucket{l} {n}'.format(
+                    l=labels(cluster=cluster, method=method, endpoint=path, le=bound), n=count
+                ))
+            common = labels(cluster=cluster, method=method, endpoint=path)
+            lines.append('ambariconfig_ambari_request_seconds_sum{l} {s:.6f}'.format(l=common, s=histogram['sum']))
+            lines.append('ambariconfig_ambari_request_seconds_count{l} {n}'.format(l=common, n=histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+    def start(self, port, address='0.0.0.0'):
+        """
+        Serve /metrics on address:port, in a thread.
+        """
+        self.server = ThreadingHTTPServer((address, port), Handler)
+        self.server.daemon_threads = True
+        self.server.exporter = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info("Serving metrics on http://{a}:{p}/metrics".format(a=address, p=self.server.server_address[1]))
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Headers and body go in one packet.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,304 @@
+"""
+A stand-in for ambari, serving a generated cluster over http, to measure
+the script against clusters of any size without a real one.
+
+Only the endpoints the script uses are there, answering like ambari does
+(including `fields` projections, paging and gzip), after an optional
+injected latency.
+"""
+import gzip
+from http.server import (BaseHTTPRequestHandler, ThreadingHTTPServer)
+import json
+import re
+import threading
+import time
+from urllib.parse import (parse_qsl, unquote, urlsplit)
+
+from hadoopSettings import rules
+
+# Live values making every rule find its key, by rule kind. Rules of
+# kind s expecting a string get that string.
+VALUES = {
+    'i': '1024',
+    'b': 'false',
+    'xmx': '-server -Xmx1024m -Djava.net.preferIPv4Stack=true',
+    's': '1024',
+}
+
+# Values some keys need to make sense, and keys Compute reads itself.
+OVERRIDES = {
+    ('hdfs-site', 'dfs.datanode.data.dir'): ','.join('/grid/{}/hdfs/data'.format(i) for i in range(12)),
+    ('capacity-scheduler', 'yarn.scheduler.capacity.root.default.capacity'): '100',
+    ('hive-site', 'hive.server2.tez.default.queues'): 'default',
+    ('hive-interactive-site', 'hive.llap.daemon.queue.name'): 'llap',
+    ('hive-interactive-site', 'hive.llap.io.memory.mode'): 'cache',
+}
+
+# Properties the script does not look at, which real property sets have plenty of.
+FILLER = 150
+
+
+def makeConfigs():
+    """
+    pset => properties, with all keys the rules look at.
+    """
+    configs = {}
+    for (pset, key), value in OVERRIDES.items():
+        configs.setdefault(pset, {})[key] = value
+    for rule in rules.RULES:
+        if rule.pset is None or rule.key is None:
+            continue
+        properties = configs.setdefault(rule.pset, {})
+        key = rule.key.format(queue='default')
+        value = rule.expect if isinstance(rule.expect, str) else VALUES[rule.kind]
+        # The first rule about a key decides.
+        properties.setdefault(key, value)
+    for pset, properties in configs.items():
+        for i in range(FILLER):
+            properties['{p}.filler.property.{i}'.format(p=pset, i=i)] = 'some/not/that/short/value/{}'.format(i)
+    return configs
+
+
+def makeHost(i):
+    """
+    Hosts resource of data node i, as ambari returns it without fields.
+    Hardware comes in a few classes.
+    """
+    cpu, memGB = [(16, 128), (32, 256), (8, 64)][i % 3]
+    name = 'dn{:05d}.example.com'.format(i)
+    return {
+        'host_name': name,
+        'cpu_count': cpu,
+        'ph_cpu_count': cpu,
+        'total_mem': memGB * 1024 * 1024,
+        'rack_info': '/rack{}'.format(i // 40),
+        'ip': '10.{}.{}.{}'.format(i // 65536, i // 256 % 256, i % 256),
+        'os_type': 'centos7',
+        'os_arch': 'x86_64',
+        'host_state': 'HEALTHY',
+        'host_status': 'HEALTHY',
+        'maintenance_state': 'OFF',
+        'public_host_name': name,
+        'disk_info': [
+            {
+                'available': '3800000000',
+                'device': '/dev/sd{}'.format(chr(ord('a') + d)),
+                'mountpoint': '/grid/{}'.format(d),
+                'size': '3900000000',
+                'type': 'xfs',
+                'used': '100000000',
+                'percent': '3%',
+            }
+            for d in range(12)
+        ],
+        'last_heartbeat_time': 1700000000000 + i,
+        'last_registration_time': 1690000000000 + i,
+    }
+
+
+def project(resource, fields):
+    """
+    Keep only fields (eg. ['Hosts/cpu_count', 'host_components/HostRoles/host_name'])
+    of resource, going through lists. No fields means all of them.
+    """
+    if not fields:
+        return resource
+    tree = {}
+    for field in fields:
+        node = tree
+        for name in field.split('/'):
+            node = node.setdefault(name, {})
+    return prune(resource, tree)
+
+
+def prune(resource, tree):
+    if not tree or '*' in tree:
+        return resource
+    if isinstance(resource, list):
+        return [prune(r, tree) for r in resource]
+    if not isinstance(resource, dict):
+        return resource
+    return {name: prune(resource[name], sub) for name, sub in tree.items() if name in resource}
+
+
+class Cluster():
+    """
+    State of the fake cluster: hosts, property sets and their tags.
+    Counts requests and bytes sent.
+    """
+
+    # Whether /hosts honours from and page_size, and answers at all:
+    # some ambari servers do not.
+    paging = True
+    bulkHosts = True
+    # Status all calls are refused with (eg. 403 for bad credentials), if any.
+    refuse = None
+
+    def __init__(self, nodes, name='bench', latency=0):
+        self.name = name
+        # Seconds to wait before answering.
+        self.latency = latency
+        self.hosts = [makeHost(i) for i in range(nodes)]
+        self.configs = makeConfigs()
+        self.tags = {pset: 'version1' for pset in self.configs}
+        # (pset, tag) => properties, of all versions.
+        self.versions = {(pset, 'version1'): p for pset, p in self.configs.items()}
+        self.requests = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, raw):
+        """
+        Response to GET path (after /api/v1) with query string raw, as
+        (status, json'able object).
+        """
+        if self.refuse:
+            return self.refuse, {'status': self.refuse, 'message': 'Refused by the fake ambari.'}
+        query = parse_qsl(raw, keep_blank_values=True)
+        fields = [f for k, v in query if k == 'fields' for f in v.split(',')]
+        if path == '/clusters':
+            return 200, {'items': [project({'Clusters': {
+                'cluster_name': self.name,
+                'version': 'HDP-2.6',
+            }}, fields)]}
+
+        prefix = '/clusters/' + self.name
+        if not path.startswith(prefix):
+            return 404, {'status': 404, 'message': 'The requested resource doesn\'t exist.'}
+        path = path[len(prefix):]
+
+        if path == '':
+            return 200, project({'Clusters': {
+                'cluster_name': self.name,
+                'version': 'HDP-2.6',
+                'total_hosts': len(self.hosts),
+                'desired_configs': {
+                    pset: {'tag': tag, 'version': 1} for pset, tag in self.tags.items()
+                },
+            }}, fields)
+        if path == '/components/DATANODE':
+            return 200, project({
+                'ServiceComponentInfo': {'component_name': 'DATANODE', 'installed_count': len(self.hosts)},
+                'host_components': [
+                    {'HostRoles': {
+                        'cluster_name': self.name,
+                        'component_name': 'DATANODE',
+                        'host_name': h['host_name'],
+                        'state': 'STARTED',
+                        'desired_state': 'STARTED',
+                        'stale_configs': False,
+                    }}
+                    for h in self.hosts
+                ],
+            }, fields)
+        if path == '/hosts' and not self.bulkHosts:
+            return 404, {'status': 404, 'message': 'The requested resource doesn\'t exist.'}
+        if path == '/hosts':
+            params = dict(query) if self.paging else {}
+            start = int(params.get('from', 0))
+            size = int(params.get('page_size', len(self.hosts)))
+            return 200, {
+                'items': [project({'Hosts': h}, fields) for h in self.hosts[start:start + size]],
+                'itemTotal': len(self.hosts),
+            }
+        m = re.match(r'/hosts/([^/]+)$', path)
+        if m:
+            for h in self.hosts:
+                if h['host_name'] == m.group(1):
+                    return 200, project({'Hosts': h}, fields)
+            return 404, {'status': 404, 'message': 'Host not found'}
+        if path == '/configurations':
+            return 200, {'items': [
+                project({
+                    'type': pset,
+                    'tag': tag,
+                    'version': 1,
+                    'Config': {'cluster_name': self.name},
+                    'properties': self.versions[(pset, tag)],
+                    'properties_attributes': {},
+                }, fields)
+                # Either type=x&tag=y, or (type=x&tag=y)|(type=z&tag=t)...
+                for pset, tag in re.findall(r'type=([^&|)]+)&tag=([^&|)]+)', unquote(raw))
+                if (pset, tag) in self.versions
+            ]}
+        if path in ('/config_groups', '/host_components'):
+            return 200, {'items': []}
+        if path.startswith('/requests/'):
+            return 200, {'Requests': {'request_status': 'COMPLETED', 'progress_percent': 100}}
+        return 404, {'status': 404, 'message': 'The requested resource doesn\'t exist.'}
+
+    def put(self, path, body):
+        """
+        New versions of property sets, see Api.update
+        """
+        for item in body if isinstance(body, list) else [body]:
+            desired = item.get('Clusters', {}).get('desired_configs', [])
+            for d in desired if isinstance(desired, list) else [desired]:
+                self.tags[d['type']] = d['tag']
+                self.versions[(d['type'], d['tag'])] = d['properties']
+        return 200, None
+
+    def post(self, path, body):
+        if path.endswith('/requests'):
+            return 202, {'Requests': {'id': 1, 'status': 'Accepted'}}
+        return 201, None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go in one packet, else delayed acks slow everything down.
+    disable_nagle_algorithm = True
+    apiPath = '/api/v1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def answer(self, status, obj):
+        cluster = self.server.cluster
+        if cluster.latency:
+            time.sleep(cluster.latency)
+        body = json.dumps(obj).encode() if obj is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        # Counted before the client can read the answer, so it sees it counted.
+        with cluster.lock:
+            cluster.requests += 1
+            cluster.bytes += len(body)
+        self.wfile.write(body)
+
+    def split(self):
+        url = urlsplit(self.path)
+        return url.path[len(self.apiPath):], url.query
+
+    def body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def do_GET(self):
+        path, query = self.split()
+        self.answer(*self.server.cluster.get(path, query))
+
+    def do_PUT(self):
+        path, _ = self.split()
+        self.answer(*self.server.cluster.put(path, self.body()))
+
+    def do_POST(self):
+        path, _ = self.split()
+        self.answer(*self.server.cluster.post(path, self.body()))
+
+
+def serve(cluster, port=0):
+    """
+    Serve cluster on localhost:port (any free port if 0), in a thread.
+    Returns the server, see server.server_address for the port.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.cluster = cluster
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,131 @@
+"""
+Evaluate many clusters, possibly managed by many ambari servers, in parallel.
+
+Each cluster is evaluated in its own thread, after what it needs (property
+sets and DN inventory) was fetched concurrently, see AsyncApi.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import shlex
+import time
+
+from hadoopSettings.asyncApi import AsyncApi
+from hadoopSettings.compute import Compute
+from hadoopSettings.config import Config
+from hadoopSettings.report import evaluate
+from hadoopSettings.results import (Result, text)
+from hadoopSettings import rules
+
+
+def readInventory(path, common=()):
+    """
+    Read one cluster per line, given as settings.py arguments, eg.
+    `ambari1.example.com --cluster prod -u admin --pwd secret`.
+    # starts a comment. `common` arguments are prepended to all lines.
+
+    Returns a list of Config.
+    """
+    configs = []
+    with open(path) as f:
+        for line in f:
+            args = shlex.split(line, comments=True)
+            if args:
+                configs.append(Config(list(common) + args))
+    return configs
+
+
+async def prefetch(config):
+    """
+    Api to the cluster of config, with the property sets its rules read
+    and its DN inventory already loaded, fetched concurrently.
+    """
+    api = await AsyncApi.connect(config)
+    try:
+        psets = rules.RULES.select(config.psets, config.services).psets() | set(Compute.psets)
+        await asyncio.gather(api.loadConfigs(psets), api.getDNInfo())
+    except Exception:
+        api.close()
+        raise
+    return api.api
+
+
+def evaluateCluster(config):
+    """
+    Evaluate one cluster, never raising so that one broken cluster does
+    not hide the others.
+
+    Returns a dict {name, seconds, results, tofix, error}
+    """
+    start = time.time()
+    result = {
+        'name': "{h}/{c}".format(h=config.ambariHost, c=config.cluster or '?'),
+        'results': [],
+        'tofix': 0,
+        'error': None,
+    }
+    try:
+        api = asyncio.run(prefetch(config))
+        try:
+            report = evaluate(config, api)
+        except Exception:
+            api.close()
+            raise
+        with report:
+            result['name'] = "{h}/{c}".format(h=config.ambariHost, c=config.cluster)
+            result['results'] = report.results
+            result['tofix'] = report.tofix
+    except Exception as e:
+        logging.debug("Could not evaluate {}".format(result['name']), exc_info=True)
+        result['error'] = repr(e)
+    result['seconds'] = time.time() - start
+    return result
+
+
+def evaluateAll(configs, workers):
+    """
+    Evaluate all clusters, at most `workers` at the same time.
+    Results are in the same order as configs.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(evaluateCluster, configs))
+
+
+def records(result):
+    """
+    Results of one cluster, after an error Result if it failed.
+    """
+    if result['error']:
+        yield Result('error', description=result['error'])
+    yield from result['results']
+
+
+def write(results, renderer):
+    """
+    Results of all clusters through renderer, with their cluster.
+    """
+    for r in results:
+        for j in records(r):
+            renderer.write(j, cluster=r['name'])
+
+
+def report(results, seconds):
+    """
+    One consolidated report: each cluster output, then a summary.
+    """
+    lines = []
+    for r in results:
+        lines.append("\n=== {n}".format(n=r['name']))
+        lines.extend(text(j) for j in records(r))
+
+    lines.append("\n=== Summary")
+    lines.append("{n:40} {s:>8} {t:>7}  {e}".format(n='cluster', s='seconds', t='to fix', e='status'))
+    for r in results:
+        lines.append("{n:40} {s:8.2f} {t:7d}  {e}".format(
+            n=r['name'],
+            s=r['seconds'],
+            t=r['tofix'],
+            e='ERROR' if r['error'] else 'ok'
+        ))
+    lines.append("{n} clusters in {s:.2f}s".format(n=len(results), s=seconds))
+    return "\n".join(lines)
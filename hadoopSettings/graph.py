@@ -0,0 +1,62 @@
+from collections.abc import Mapping
+
+
+class Graph(Mapping):
+    """
+    Named values, either inputs or nodes computed from other named values.
+
+    Nodes are computed lazily, on first access, then remembered until one
+    of the values they depend on changes: setting an input only forgets
+    the values computed from it, directly or not.
+
+    A Graph is a read only mapping name => value, so it can be used as
+    the namespace of an expression.
+    """
+
+    def __init__(self):
+        # name => function computing it, None for inputs.
+        self.functions = {}
+        # name => names of the values the function is called with.
+        self.deps = {}
+        self.memo = {}
+
+    def input(self, name, value):
+        """
+        Set input name to value.
+        """
+        self.functions[name] = None
+        self.deps[name] = ()
+        self.memo[name] = value
+        self.invalidate(name)
+
+    def node(self, name, deps, function):
+        """
+        name is computed as function(*deps values).
+        """
+        self.functions[name] = function
+        self.deps[name] = tuple(deps)
+        self.memo.pop(name, None)
+        self.invalidate(name)
+
+    def invalidate(self, name):
+        """
+        Forget everything computed from name.
+        """
+        for other, deps in self.deps.items():
+            if name in deps and other in self.memo:
+                del self.memo[other]
+                self.invalidate(other)
+
+    def __getitem__(self, name):
+        if name not in self.memo:
+            function = self.functions[name]
+            if function is None:
+                raise KeyError("Input {} is not set.".format(name))
+            self.memo[name] = function(*[self[d] for d in self.deps[name]])
+        return self.memo[name]
+
+    def __iter__(self):
+        return iter(self.functions)
+
+    def __len__(self):
+        return len(self.functions)
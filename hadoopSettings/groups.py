@@ -0,0 +1,162 @@
+"""
+Per host group sizing, for clusters whose data nodes are not all identical.
+
+Cluster wide settings are worked out for the smallest data node. Per node
+settings can instead be worked out for each group of nodes, and set
+through ambari config groups.
+"""
+from hadoopSettings.compute import (GB, MB)
+from hadoopSettings.snapshot import CONFIGURATION_FIELDS
+
+# Per node settings worked out for each group, from the group's graph.
+PER_NODE = {
+    'yarn.nodemanager.resource.memory-mb': lambda graph: int(graph['yarnMemPerNode'] / MB),
+    'yarn.nodemanager.resource.cpu-vcores': lambda graph: graph['availableCores'],
+}
+
+
+class HostGroups():
+    """
+    Data nodes bucketed in groups, by mode:
+    - hardware: nodes with the same cpu and memory
+    - ambari: existing YARN config groups, nodes in none of them being in
+      the default (None) group.
+    The index is built once, from the hosts Compute knows.
+    """
+
+    # Name prefix of the config groups created for hardware classes.
+    prefix = 'ambariconfig-'
+
+    def __init__(self, api, c, mode):
+        self.api = api
+        self.c = c
+        self.mode = mode
+        self.existing = self.getConfigGroups()
+        if mode == 'hardware':
+            self.groups = self.byHardware()
+        else:
+            self.groups = self.byConfigGroup()
+        self.overrides = self.size()
+
+    def getConfigGroups(self):
+        """
+        Existing YARN config groups, as name => {id, hosts, tags}
+        """
+        items = self.api.call('/config_groups?ConfigGroup/tag=YARN', fields=(
+            'ConfigGroup/id', 'ConfigGroup/group_name', 'ConfigGroup/hosts', 'ConfigGroup/desired_configs'
+        ))['items']
+        groups = {}
+        for item in items:
+            group = item['ConfigGroup']
+            groups[group['group_name']] = {
+                'id': group['id'],
+                'hosts': [h['host_name'] for h in group.get('hosts', [])],
+                'tags': {d['type']: d['tag'] for d in group.get('desired_configs', [])},
+            }
+        return groups
+
+    def byHardware(self):
+        return {
+            '{p}{cpu}cpu-{mem}GB'.format(p=self.prefix, cpu=cpu, mem=mem // GB): hosts
+            for (cpu, mem), hosts in self.c.hosts.groupBy('cpu', 'mem').items()
+        }
+
+    def byConfigGroup(self):
+        groups = {}
+        grouped = set()
+        for name, group in self.existing.items():
+            hosts = self.c.hosts.subset(group['hosts'])
+            if hosts:
+                groups[name] = hosts
+                grouped.update(hosts)
+        rest = self.c.hosts.subset(h for h in self.c.hosts if h not in grouped)
+        if rest:
+            groups[None] = rest
+        return groups
+
+    def size(self):
+        """
+        Per node settings of each group, as group => {key: value}
+        """
+        return {
+            name: {key: f(self.c.sizeFor(hosts)) for key, f in PER_NODE.items()}
+            for name, hosts in self.groups.items()
+        }
+
+    def clusterWide(self):
+        return {key: f(self.c.graph) for key, f in PER_NODE.items()}
+
+    def report(self):
+        """
+        Lines to display.
+        """
+        lines = ['\nPer host group sizing (cluster wide: {})'.format(self.format(self.clusterWide()))]
+        for name, values in sorted(self.overrides.items(), key=lambda x: x[0] or ''):
+            lines.append("{g} ({n} DNs): {v}".format(
+                g=name or 'default group',
+                n=len(self.groups[name]),
+                v=self.format(values)
+            ))
+        return lines
+
+    def format(self, values):
+        return ', '.join('{k}={v}'.format(k=k, v=v) for k, v in sorted(values.items()))
+
+    def apply(self):
+        """
+        Create or update config groups whose settings differ from the
+        cluster wide ones. Returns True if something was done.
+        """
+        updates = False
+        for name, values in self.overrides.items():
+            # The default group gets cluster wide settings.
+            if name is None or values == self.clusterWide():
+                continue
+            print("Updating config group {g} with:".format(g=name))
+            print(self.format(values))
+            if name in self.existing:
+                self.updateGroup(name, values)
+            else:
+                self.createGroup(name, values)
+            updates = True
+        return updates
+
+    def groupBody(self, name, hosts, properties):
+        return [{
+            'ConfigGroup': {
+                'cluster_name': self.api.config.cluster,
+                'group_name': name,
+                'tag': 'YARN',
+                'description': 'Per node yarn settings, by a wondrous script.',
+                'hosts': [{'host_name': h} for h in sorted(hosts)],
+                'desired_configs': [{
+                    'type': 'yarn-site',
+                    'tag': self.api.newTag(),
+                    'properties': properties,
+                }],
+            }
+        }]
+
+    def createGroup(self, name, values):
+        self.api.post('/config_groups', self.groupBody(name, self.groups[name], values))
+
+    def updateGroup(self, name, values):
+        """
+        Keep the other yarn-site overrides of the group, and its hosts
+        (hardware classes get their current hosts).
+        """
+        group = self.existing[name]
+        properties = {}
+        tag = group['tags'].get('yarn-site')
+        if tag is not None:
+            current = self.api.call(
+                '/configurations?type=yarn-site&tag={t}'.format(t=tag),
+                fields=CONFIGURATION_FIELDS
+            )
+            properties = dict(current['items'][0]['properties'])
+        properties.update(values)
+        hosts = self.groups[name] if self.mode == 'hardware' else group['hosts']
+        self.api.put(
+            '/config_groups/{i}'.format(i=group['id']),
+            self.groupBody(name, hosts, properties)
+        )
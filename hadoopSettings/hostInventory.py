@@ -0,0 +1,120 @@
+from array import array
+from collections.abc import Mapping
+
+
+class HostInventory(Mapping):
+    """
+    Data nodes, as columns: host names are kept once, and cpu, memory (in
+    bytes) and rack of each host in typed arrays, the i'th value of each
+    column being the one of the i'th name. Aggregates run over a column
+    at once instead of walking one dict per host.
+
+    It is also a read only mapping hostname => {cpu, mem}, like the
+    dicts it replaces.
+    """
+
+    def __init__(self):
+        self.names = []
+        # hostname => position in the columns.
+        self.index = {}
+        self.columns = {
+            'cpu': array('l'),
+            'mem': array('q'),
+            # Positions in self.racks.
+            'rack': array('l'),
+        }
+        self.racks = []
+        # rack => position in self.racks.
+        self.rackIds = {}
+
+    @classmethod
+    def fromDict(cls, hosts):
+        """
+        Inventory of a dict hostname => {cpu, mem[, rack]}
+        """
+        inventory = cls()
+        for name, host in hosts.items():
+            inventory.add(name, host)
+        return inventory
+
+    def toDict(self):
+        """
+        hostname => {cpu, mem, rack}, eg. to save it as json.
+        """
+        return {name: dict(self[name], rack=self.rackOf(name)) for name in self.names}
+
+    def add(self, name, host):
+        """
+        Add (or replace) host name, given as {cpu, mem[, rack]}.
+        """
+        rack = host.get('rack')
+        if rack not in self.rackIds:
+            self.rackIds[rack] = len(self.racks)
+            self.racks.append(rack)
+        values = {'cpu': host['cpu'], 'mem': host['mem'], 'rack': self.rackIds[rack]}
+
+        if name in self.index:
+            for column, value in values.items():
+                self.columns[column][self.index[name]] = value
+            return
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        for column, value in values.items():
+            self.columns[column].append(value)
+
+    def subset(self, names):
+        """
+        Inventory of hosts names only (the ones this one knows).
+        """
+        inventory = HostInventory()
+        for name in names:
+            if name in self.index:
+                inventory.add(name, dict(self[name], rack=self.rackOf(name)))
+        return inventory
+
+    def rackOf(self, name):
+        return self.racks[self.columns['rack'][self.index[name]]]
+
+    def sum(self, column):
+        return sum(self.columns[column])
+
+    def min(self, column):
+        return min(self.columns[column])
+
+    def max(self, column):
+        return max(self.columns[column])
+
+    def percentile(self, column, p):
+        """
+        Nearest rank p'th percentile (0-100) of column.
+        """
+        values = sorted(self.columns[column])
+        rank = max(1, -(-len(values) * p // 100))
+        return values[int(rank) - 1]
+
+    def groupBy(self, *columns):
+        """
+        Hosts by their values of columns (racks by name), as
+        tuple of values => HostInventory.
+        """
+        keys = zip(*[
+            map(self.racks.__getitem__, self.columns[c]) if c == 'rack' else self.columns[c]
+            for c in columns
+        ])
+        names = {}
+        for name, key in zip(self.names, keys):
+            names.setdefault(key, []).append(name)
+        return {key: self.subset(hosts) for key, hosts in names.items()}
+
+    def __getitem__(self, name):
+        i = self.index[name]
+        return {'cpu': self.columns['cpu'][i], 'mem': self.columns['mem'][i]}
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,127 @@
+"""
+What a run spent its time on: every ambari call, and named spans of work.
+"""
+import bisect
+import collections
+import contextlib
+import json
+import re
+import threading
+import time
+
+# Upper bounds (seconds) of the buckets of call latency histograms.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Path segments which are names or ids, folded so that calls to the
+# same endpoint are reported together.
+NAMED = re.compile(r'/(clusters|hosts|requests|config_groups|services|components)/[^/?]+')
+
+
+def template(path):
+    """
+    Endpoint of path, eg. /clusters/{id}/hosts/{id} for
+    /clusters/c1/hosts/dn001?fields=Hosts/cpu_count
+    """
+    return NAMED.sub(r'/\1/{id}', path.split('?')[0])
+
+
+class Metrics():
+    """
+    Calls are kept as dicts {method, path, status, seconds, bytes, source},
+    source being ambari, cache or replay, the last `keep` of them only so
+    that long running processes do not grow. Spans as name => [seconds].
+
+    Latencies of calls to ambari are also counted in histograms, per
+    (method, path), as {buckets: [count per bucket of BUCKETS, and above], sum, count}.
+    """
+
+    def __init__(self, keep=100000):
+        self.calls = collections.deque(maxlen=keep)
+        self.spans = {}
+        self.latency = {}
+        # Guards what record and span keep.
+        self.lock = threading.Lock()
+
+    def record(self, method, path, status=None, seconds=0, size=0, source='ambari'):
+        path = template(path)
+        with self.lock:
+            self.calls.append({
+                'method': method,
+                'path': path,
+                'status': status,
+                'seconds': seconds,
+                'bytes': size,
+                'source': source,
+            })
+            if source == 'ambari':
+                histogram = self.latency.setdefault((method, path), {
+                    'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0, 'count': 0
+                })
+                histogram['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+                histogram['sum'] += seconds
+                histogram['count'] += 1
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Time the with block, as name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.spans.setdefault(name, []).append(seconds)
+
+    def endpoints(self):
+        """
+        Calls to ambari per (method, path), slowest first, as a list of
+        {method, path, count, seconds, max, bytes}
+        """
+        totals = {}
+        for call in self.calls:
+            if call['source'] != 'ambari':
+                continue
+            key = (call['method'], call['path'])
+            t = totals.setdefault(key, {
+                'method': key[0], 'path': key[1], 'count': 0, 'seconds': 0, 'max': 0, 'bytes': 0
+            })
+            t['count'] += 1
+            t['seconds'] += call['seconds']
+            t['max'] = max(t['max'], call['seconds'])
+            t['bytes'] += call['bytes']
+        return sorted(totals.values(), key=lambda t: -t['seconds'])
+
+    def report(self, top=10):
+        """
+        Lines to display: spans, slowest endpoints, cache hit ratio.
+        """
+        lines = ['\nProfile']
+        for name, times in self.spans.items():
+            lines.append("{n:40} {c:5d} x {s:8.3f}s".format(n=name, c=len(times), s=sum(times)))
+
+        lines.append("\n{m:6} {p:40} {c:>5} {s:>9} {x:>8} {b:>10}".format(
+            m='method', p='endpoint', c='calls', s='seconds', x='max', b='bytes'
+        ))
+        for t in self.endpoints()[:top]:
+            lines.append("{method:6} {path:40} {count:5d} {seconds:9.3f} {max:8.3f} {bytes:10d}".format(**t))
+
+        gets = [c for c in self.calls if c['method'] == 'GET']
+        hits = sum(1 for c in gets if c['source'] == 'cache')
+        lines.append("\n{n} calls to ambari, {s:.3f}s, {b} bytes. Cache hits: {h}/{g} ({r:.0%}).".format(
+            n=sum(1 for c in self.calls if c['source'] == 'ambari'),
+            s=sum(c['seconds'] for c in self.calls if c['source'] == 'ambari'),
+            b=sum(c['bytes'] for c in self.calls),
+            h=hits,
+            g=len(gets),
+            r=hits / len(gets) if gets else 0
+        ))
+        return lines
+
+    def dump(self, path):
+        """
+        Save all calls and spans as json.
+        """
+        with open(path, 'w') as f:
+            json.dump({'calls': list(self.calls), 'spans': self.spans}, f, indent=1)
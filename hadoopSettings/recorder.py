@@ -0,0 +1,44 @@
+import gzip
+import json
+import logging
+
+from hadoopSettings.exceptions import (NotRecorded)
+
+
+class Recorder():
+    """
+    Remember every response ambari gives, to save them all in one
+    gzip'ed json file at the end.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+
+    def add(self, key, response):
+        self.responses[key] = response
+
+    def save(self):
+        with gzip.open(self.path, 'wt') as f:
+            json.dump({'responses': self.responses}, f, separators=(',', ':'))
+        logging.info("Recorded {n} responses in {p}".format(
+            n=len(self.responses),
+            p=self.path
+        ))
+
+
+class Replayer():
+    """
+    Answer api calls from a file saved by Recorder, without any network.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with gzip.open(path, 'rt') as f:
+            self.responses = json.load(f)['responses']
+
+    def get(self, key):
+        try:
+            return self.responses[key]
+        except KeyError:
+            raise NotRecorded("{k} is not in {p}".format(k=key, p=self.path))
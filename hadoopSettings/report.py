@@ -0,0 +1,66 @@
+"""
+Evaluating a cluster as a library call: what settings.py does before
+displaying anything, usable from long lived processes.
+"""
+from hadoopSettings.ambariApi import Api
+from hadoopSettings.compute import Compute
+from hadoopSettings import rules
+
+
+class Report():
+    """
+    What evaluating a cluster gave: the Results, in rules order, and
+    what produced them, to update the cluster or keep watching it.
+    The api stays open until close (or the end of a with block).
+    """
+
+    def __init__(self, config, api, ruleset, c, results):
+        self.config = config
+        self.api = api
+        self.ruleset = ruleset
+        self.c = c
+        self.results = results
+
+    @property
+    def tofix(self):
+        """
+        Number of settings not as expected, updatable or not.
+        """
+        return (
+            sum(len(v) for v in self.c.toupdate.values()) +
+            sum(len(v) for v in self.c.noupdate.values())
+        )
+
+    def close(self):
+        self.api.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def evaluate(config, api=None, write=None):
+    """
+    Evaluate the rules config selects against its cluster, with api (a
+    new Api if None, closed if evaluating fails). write, if given, is
+    called with each Result as soon as rules give it. Returns a Report.
+    """
+    own = api is None
+    if own:
+        api = Api(config)
+    try:
+        ruleset = rules.RULES.select(config.psets, config.services)
+        c = Compute(config, api, ruleset.psets())
+        with api.metrics.span('rules'):
+            results = []
+            for result in ruleset.evaluate(config, api, c):
+                results.append(result)
+                if write is not None:
+                    write(result)
+    except Exception:
+        if own:
+            api.close()
+        raise
+    return Report(config, api, ruleset, c, results)
@@ -0,0 +1,139 @@
+"""
+Restart what an update made stale, and only that: the components ambari
+says have stale configs, in rolling batches of hosts.
+"""
+import logging
+import time
+
+from hadoopSettings.exceptions import RestartFailed
+
+# Request states after which ambari does nothing more.
+DONE = {'COMPLETED', 'FAILED', 'ABORTED', 'TIMEDOUT', 'SKIPPED_FAILED', 'HOLDING_FAILED', 'HOLDING_TIMEDOUT'}
+
+
+class Restart():
+    """
+    Stale components are restarted batchSize hosts at a time: all stale
+    components of the hosts of a batch go in one ambari request, which
+    restarts them in parallel, and the next batch starts once it is done.
+    Up to `tolerance` batches can fail before giving up, a batch ambari
+    is not done with after `timeout` seconds counts as failed.
+    """
+
+    # Seconds between two polls of a request, doubled each time up to maxDelay.
+    delay = 1
+    maxDelay = 30
+
+    def __init__(self, api, batchSize=10, tolerance=0, timeout=3600):
+        self.api = api
+        self.batchSize = batchSize
+        self.tolerance = tolerance
+        self.timeout = timeout
+        # host => {(service, component)}
+        self.stale = self.staleComponents()
+
+    def staleComponents(self):
+        """
+        Components with stale configs, whatever the service: a property
+        set can be read by the components of other services (eg. hdfs-site
+        by YARN and Hive), ambari knows which. Asked fresh, as the update
+        just changed them. Nothing when replaying: nothing was updated.
+        """
+        if self.api.replayer:
+            logging.warning("Replaying, not restarting anything.")
+            return {}
+        items = self.api.fetch('/host_components?HostRoles/stale_configs=true', fields=(
+            'HostRoles/host_name', 'HostRoles/service_name', 'HostRoles/component_name'
+        ))['items']
+        stale = {}
+        for item in items:
+            role = item['HostRoles']
+            stale.setdefault(role['host_name'], set()).add((role['service_name'], role['component_name']))
+        return stale
+
+    def batches(self):
+        hosts = sorted(self.stale)
+        return [hosts[i:i + self.batchSize] for i in range(0, len(hosts), self.batchSize)]
+
+    def filters(self, hosts):
+        """
+        Ambari resource filters for the stale components of hosts.
+        """
+        components = {}
+        for host in hosts:
+            for component in self.stale[host]:
+                components.setdefault(component, []).append(host)
+        return [
+            {'service_name': service, 'component_name': component, 'hosts': ','.join(on)}
+            for (service, component), on in sorted(components.items())
+        ]
+
+    def submit(self, hosts, n):
+        """
+        Ask ambari to restart the stale components of hosts, returns the request id.
+        """
+        r = self.api.post('/requests', {
+            'RequestInfo': {
+                'command': 'RESTART',
+                'context': 'Restart stale components, batch {n}, by a wondrous script.'.format(n=n),
+                'operation_level': {
+                    'level': 'HOST_COMPONENT',
+                    'cluster_name': self.api.config.cluster,
+                },
+            },
+            'Requests/resource_filters': self.filters(hosts),
+        })
+        return r['Requests']['id']
+
+    def wait(self, request):
+        """
+        Poll request until ambari is done with it, backing off. Returns its
+        final state, or WAIT_TIMEDOUT if it is not done after self.timeout.
+        """
+        delay = self.delay
+        deadline = time.monotonic() + self.timeout
+        while True:
+            status = self.api.fetch(
+                '/requests/{r}'.format(r=request),
+                fields=('Requests/request_status', 'Requests/progress_percent')
+            )['Requests']
+            logging.info("Request {r}: {s} {p}%".format(
+                r=request,
+                s=status['request_status'],
+                p=status.get('progress_percent')
+            ))
+            if status['request_status'] in DONE:
+                return status['request_status']
+            left = deadline - time.monotonic()
+            if left <= 0:
+                logging.error("Request {r} not done after {t}s, not waiting for it anymore.".format(
+                    r=request,
+                    t=self.timeout
+                ))
+                return 'WAIT_TIMEDOUT'
+            time.sleep(min(delay, left))
+            delay = min(delay * 2, self.maxDelay)
+
+    def run(self):
+        """
+        Restart batch after batch. Returns the number of failed batches,
+        raises RestartFailed once more than tolerance did.
+        """
+        batches = self.batches()
+        if not batches:
+            print("Nothing to restart.")
+            return 0
+
+        failed = 0
+        for n, hosts in enumerate(batches, 1):
+            print("Restarting batch {n}/{t}: {h}".format(n=n, t=len(batches), h=', '.join(hosts)))
+            status = self.wait(self.submit(hosts, n))
+            if status != 'COMPLETED':
+                failed += 1
+                logging.error("Restart batch {n} ended {s}.".format(n=n, s=status))
+                if failed > self.tolerance:
+                    raise RestartFailed(
+                        "{f} restart batches failed, giving up after batch {n}/{t}."
+                        .format(f=failed, n=n, t=len(batches))
+                    )
+        return failed
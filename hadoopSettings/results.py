@@ -0,0 +1,185 @@
+"""
+What evaluating rules produces: one Result per displayed line, and the
+renderers writing them out, as they come, for a terminal or for programs.
+"""
+import csv
+import functools
+import inspect
+import json
+
+
+class bcolor(object):
+    """Backgroud colors"""
+    OK_COL = '\033[92m'
+    NOK_COL = '\033[91m'
+    NOTBAD_COL = '\033[35m'
+    END_COL = '\033[0m'
+
+    OK_CHAR = "\u2714"
+    NOK_CHAR = "\u2718"
+    NOTBAD_CHAR = "~"
+
+
+# Columns of a result, for json and csv.
+FIELDS = ('kind', 'pset', 'key', 'value', 'expect', 'about', 'description')
+
+
+@functools.lru_cache(maxsize=None)
+def sourceOfCode(code):
+    return inspect.getsource(code).strip().rstrip(',')
+
+
+def sourceOf(expect):
+    """
+    Source of a callable expect. Checks from the rules table know theirs,
+    the source of lambdas is read once per lambda.
+    """
+    source = getattr(expect, 'source', None)
+    if source is not None:
+        return source
+    code = getattr(expect, '__code__', None)
+    return sourceOfCode(code) if code is not None else repr(expect)
+
+
+class Result():
+    """
+    One result of evaluating rules. `kind` is one of:
+    - check: live value of pset/key compared to expect, about being how
+      close it is (1 when as expected), see Compute.expects
+    - fyi: a value, with description
+    - fyis, text, title: description only
+    - error: description says what went wrong
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, kind, pset=None, key=None, value=None, expect=None, about=None, description=None):
+        self.kind = kind
+        self.pset = pset
+        self.key = key
+        self.value = value
+        self.expect = expect
+        self.about = about
+        self.description = description
+
+    @property
+    def expected(self):
+        """
+        Human readable expect, only worked out when displayed.
+        """
+        if self.expect is None:
+            return 'No idea'
+        elif callable(self.expect):
+            return "'{}'".format(sourceOf(self.expect))
+        return str(self.expect)
+
+    def asDict(self):
+        return {
+            'kind': self.kind,
+            'pset': self.pset,
+            'key': self.key,
+            'value': self.value,
+            'expect': self.expected if callable(self.expect) else self.expect,
+            'about': self.about,
+            'description': self.description.strip() if isinstance(self.description, str) else self.description,
+        }
+
+
+class Deferred():
+    """
+    A Result still to be worked out, by call, once the live values of
+    pset are loaded. See Compute.planning.
+    """
+    __slots__ = ('pset', 'call', 'result')
+
+    def __init__(self, pset, call):
+        self.pset = pset
+        self.call = call
+        self.result = None
+
+    def resolve(self):
+        self.result = self.call()
+        return self.result
+
+
+def mark(about):
+    if about == 1:
+        return bcolor.OK_COL + bcolor.OK_CHAR + bcolor.END_COL
+    elif about > 0.95 and about < 1.05:
+        return bcolor.NOTBAD_COL + bcolor.NOTBAD_CHAR + bcolor.END_COL
+    else:
+        return bcolor.NOK_COL + bcolor.NOK_CHAR + bcolor.END_COL
+
+
+def text(result):
+    """
+    result as a line for a terminal.
+    """
+    if result.kind == 'check':
+        return "{check} {pset}/{config} = {value}, expects {expect} {expl} {about}".format(
+            check=mark(result.about),
+            pset=result.pset,
+            config=result.key,
+            value=result.value,
+            expect=result.expected,
+            expl="({})".format(result.description) if result.description else "",
+            about=" #{}%".format(int(100 * result.about))
+        )
+    elif result.kind == 'fyi':
+        return "FYI - {value}: {expl}".format(value=result.value, expl=result.description)
+    elif result.kind == 'fyis':
+        return "FYI - {expl}".format(expl=result.description)
+    elif result.kind == 'error':
+        return "ERROR: {e}".format(e=result.description)
+    return result.description
+
+
+class TerminalRenderer():
+    """
+    Lines, as they always were. Extra fields (eg. cluster) are not displayed.
+    """
+
+    def __init__(self, out, extra=()):
+        self.out = out
+
+    def write(self, result, **extra):
+        print(text(result), file=self.out, flush=True)
+
+
+class JsonLinesRenderer():
+    """
+    One json object per result, extra fields first.
+    """
+
+    def __init__(self, out, extra=()):
+        self.out = out
+
+    def write(self, result, **extra):
+        record = dict(extra)
+        record.update(result.asDict())
+        self.out.write(json.dumps(record, default=str) + '\n')
+        self.out.flush()
+
+
+class CsvRenderer():
+    """
+    One row per result, after a header: extra fields, then FIELDS.
+    """
+
+    def __init__(self, out, extra=()):
+        self.out = out
+        self.writer = csv.DictWriter(out, fieldnames=list(extra) + list(FIELDS))
+        self.writer.writeheader()
+
+    def write(self, result, **extra):
+        record = dict(extra)
+        record.update(result.asDict())
+        self.writer.writerow(record)
+        self.out.flush()
+
+
+# --format => renderer class
+RENDERERS = {
+    'text': TerminalRenderer,
+    'jsonl': JsonLinesRenderer,
+    'csv': CsvRenderer,
+}
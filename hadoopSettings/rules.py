@@ -0,0 +1,381 @@
+"""
+The rules: what we expect each config value to be.
+
+Rules are a table, compiled once at import. Expected values are either
+constants, or an `Expr` over derived values (see `values`).
+"""
+from collections import ChainMap
+import pprint
+
+from hadoopSettings.results import (Deferred, Result)
+
+pp = pprint.PrettyPrinter(indent=2)
+
+DOC = """
+
+More doc can be found at:
+Memory settings:
+  https://docs.hortonworks.com/HDPDocuments/HDP2/HDP-2.6.1/bk_command-line-installation/content/determine-hdp-memory-config.html
+  https://community.hortonworks.com/articles/14309/demystify-tez-tuning-step-by-step.html
+Hive performance tuning:
+  https://docs.hortonworks.com/HDPDocuments/HDP2/HDP-2.6.1/bk_hive-performance-tuning/content/ch_hive-perf-tuning-intro.html
+  http://pivotalhd.docs.pivotal.io/docs/performance-tuning-guide.html
+  https://www.justanalytics.com/blog/hive-tez-query-optimization
+llap:
+  https://community.hortonworks.com/questions/84636/llap-not-using-io-cache.html
+"""
+
+# Ambari service owning each property set.
+SERVICES = {
+    'capacity-scheduler': 'YARN',
+    'hdfs-site': 'HDFS',
+    'hive-interactive-env': 'HIVE',
+    'hive-interactive-site': 'HIVE',
+    'hive-site': 'HIVE',
+    'mapred-site': 'MAPREDUCE2',
+    'tez-interactive-site': 'HIVE',
+    'tez-site': 'TEZ',
+    'yarn-site': 'YARN',
+}
+
+
+class Expr():
+    """
+    Python expression over derived values, compiled once.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.code = compile(source, '<rule>', 'eval')
+
+    def __call__(self, values):
+        return eval(self.code, {}, values)
+
+
+class Check(Expr):
+    """
+    Predicate on the live value `x`, which can also use derived values.
+    """
+
+    def __call__(self, values):
+        def check(x):
+            return eval(self.code, {}, ChainMap({'x': x}, values))
+        # Displayed instead of the source of check.
+        check.source = 'lambda x: ' + self.source
+        return check
+
+
+class Rule():
+    """
+    One row of the table. `kind` tells how to compare:
+    - s: as is
+    - i: as an int
+    - b: as a boolean, 'true' or 'false'
+    - xmx: the -Xmx value (in MB) of java options
+    - fyi: only display expect, with description
+    - fyis: only display expect
+    - text: a line of text
+    Rules with a `when` expression are only used when it is true.
+    """
+
+    def __init__(self, kind, pset, key, expect, description=None, when=None):
+        self.kind = kind
+        self.pset = pset
+        self.key = key
+        self.expect = expect
+        self.description = description
+        self.when = Expr(when) if when else None
+        self.service = SERVICES.get(pset)
+
+    def evaluate(self, c, values):
+        """
+        Returns the Result (None for nothing to display).
+        """
+        expect = self.expect(values) if isinstance(self.expect, Expr) else self.expect
+
+        if self.kind == 'fyi':
+            return c.fyi(expect, self.description)
+        elif self.kind == 'fyis':
+            return c.fyis(expect)
+        elif self.kind == 'text':
+            return Result('text', description=expect)
+
+        key = self.key.format_map(values) if '{' in self.key else self.key
+        expects = {
+            's': c.expects,
+            'i': c.expects_int,
+            'b': c.expects_bool,
+            'xmx': c.expects_xmx,
+        }[self.kind]
+        return expects(self.pset, key, expect, self.description)
+
+
+class RuleSet():
+    """
+    Sections of rules, as a list of (title, rules). A None title is not displayed.
+    """
+
+    def __init__(self, sections):
+        self.sections = sections
+
+    def __iter__(self):
+        for title, rules in self.sections:
+            yield from rules
+
+    def select(self, psets=None, services=None):
+        """
+        RuleSet of rules about any of psets or services (all rules if
+        both are None). Rules about no pset are dropped as soon as there
+        is a filter.
+        """
+        def keep(r):
+            if psets is None and services is None:
+                return True
+            return r.pset in (psets or ()) or r.service in (services or ())
+
+        sections = []
+        for title, rules in self.sections:
+            kept = [r for r in rules if keep(r)]
+            if kept:
+                sections.append((title, kept))
+        return RuleSet(sections)
+
+    def psets(self):
+        """
+        Property sets the rules are about, to prefetch them.
+        """
+        return {r.pset for r in self if r.pset is not None}
+
+    def evaluate(self, config, api, c):
+        """
+        Compare live config values of the cluster with what we expect.
+        Rules are first evaluated while planning (see Compute.planning),
+        so that all property sets they need are loaded at once, then
+        their deferred results are completed.
+        Yields Results in rules order, section titles included.
+        """
+        v = values(config, api, c)
+        planned = []
+        with c.planning() as deferred:
+            for title, rules in self.sections:
+                if title is not None:
+                    planned.append(Result('title', description=title.format_map(v)))
+                for rule in rules:
+                    if rule.when is None or rule.when(v):
+                        planned.append(rule.evaluate(c, v))
+        c.resolve(deferred)
+
+        for result in planned:
+            if isinstance(result, Deferred):
+                result = result.result
+            if result is not None:
+                yield result
+
+
+def values(config, api, c):
+    """
+    Derived values rules can use: the ones of c.graph, and a few more.
+    They are only computed if a rule uses them.
+    """
+    return ChainMap({
+        'MB': c.MB,
+        'queue': config.queue,
+        'llap': config.llap,
+        'pformat': pp.pformat,
+    }, c.graph)
+
+
+RULES = RuleSet([
+    ('\nBasic info', [
+        Rule('fyi', None, None, Expr('pformat(dict(hosts))'), "Data nodes."),
+        Rule('fyi', None, None, Expr('pformat(totals)'), "Total cluster resources."),
+        Rule('fyi', None, None, Expr('minContainerSizeMB'),
+             'Min container size (MB), based on amount of ram/cpu in the cluster.'),
+        Rule('fyi', None, None, Expr('numContainers'), 'Number of containers based on recommendations.'),
+        Rule('fyi', None, None, Expr('qcapacity'), 'Default queue capacity.'),
+    ]),
+
+    ('\nYarn config.', [
+        Rule('i', 'yarn-site', 'yarn.nodemanager.resource.memory-mb', Expr('yarnMemPerNode / MB'),
+             "min(yarn memory for one DN) * 0.75."),
+        Rule('i', 'yarn-site', 'yarn.scheduler.minimum-allocation-mb', Expr('minContainerSizeMB'),
+             "Min container size."),
+        Rule('i', 'yarn-site', 'yarn.scheduler.maximum-allocation-mb', Expr('yarnMemPerNode / MB'),
+             "Same as yarn.nodemanager.resource.memory-mb"),
+        Rule('i', 'yarn-site', 'yarn.nodemanager.resource.cpu-vcores', Expr('availableCores'),
+             'Assuming the cluster in yarn only. Total cores per node -1'),
+        Rule('i', 'yarn-site', 'yarn.scheduler.maximum-allocation-vcores', Expr('availableCores'),
+             'Assuming the cluster in yarn only. Total cores per node -1'),
+        Rule('s', 'capacity-scheduler', 'yarn.scheduler.capacity.resource-calculator',
+             'org.apache.hadoop.yarn.util.resource.DominantResourceCalculator',
+             'Take all resources in account, not only RAM'),
+    ]),
+
+    ('Map/reduce config', [
+        Rule('i', 'mapred-site', 'mapreduce.map.memory.mb', Expr('minContainerSizeMB'),
+             "Min container size"),
+        Rule('i', 'mapred-site', 'mapreduce.reduce.memory.mb', Expr('2 * minContainerSizeMB'),
+             "2 * min container size"),
+        Rule('xmx', 'mapred-site', 'mapreduce.map.java.opts', Expr('0.8 * minContainerSizeMB'),
+             "0.8 * min container size"),
+        Rule('xmx', 'mapred-site', 'mapreduce.reduce.java.opts', Expr('0.8 * 2 * minContainerSizeMB'),
+             "0.8 * mapreduce.reduce.memory.mb"),
+        Rule('i', 'mapred-site', 'yarn.app.mapreduce.am.resource.mb', Expr('2 * minContainerSizeMB'),
+             "2 * min container size"),
+        Rule('xmx', 'mapred-site', 'yarn.app.mapreduce.am.command-opts', Expr('0.8 * 2 * minContainerSizeMB'),
+             "0.8 * yarn.app.mapreduce.am.resource.mb"),
+        Rule('i', 'mapred-site', 'mapreduce.task.io.sort.mb', Expr('0.4 * minContainerSizeMB'),
+             '0.4 * min container size'),
+    ]),
+
+    ("\nHive and Tez configuration", [
+        Rule('s', 'hive-site', 'hive.execution.engine', 'tez', 'Use Tez, not map/reduce.'),
+        Rule('b', 'hive-site', 'hive.server2.enable.doAs', 'false',
+             'All queries will run as Hive user, allowing resource sharing/reuse.'),
+        Rule('b', 'hive-site', 'hive.optimize.index.filter', 'true',
+             'This optimizes "select statement with where clause" on ORC tables'),
+        Rule('s', 'hive-site', 'hive.fetch.task.conversion', 'more',
+             'This optimizes "select statement with limit clause;"'),
+        Rule('b', 'hive-site', 'hive.compute.query.using.stats', 'true',
+             'This optimizes "select count (1) from table;" '),
+        Rule('b', 'hive-site', 'hive.vectorized.execution.enabled', 'true',
+             'Perform operations in batch instead of single row'),
+        Rule('b', 'hive-site', 'hive.vectorized.execution.reduce.enabled', 'true',
+             'Perform operations in batch instead of single row'),
+        Rule('b', 'hive-site', 'hive.cbo.enable', 'true',
+             'Enable CBO. You still need to prepare it by using the analyse HQL command.'),
+        Rule('b', 'hive-site', 'hive.compute.query.using.stats', 'true', 'Use CBO.'),
+        Rule('b', 'hive-site', 'hive.stats.fetch.column.stats', 'true', 'Use CBO.'),
+        Rule('b', 'hive-site', 'hive.stats.fetch.partition.stats', 'true', 'Use CBO.'),
+        Rule('b', 'hive-site', 'hive.stats.autogather', 'true', 'Use CBO.'),
+        Rule('s', 'hive-site', 'hive.server2.tez.default.queues', Check('queue in x'),
+             'Must contain the queue name'),
+        Rule('b', 'hive-site', 'hive.tez.dynamic.partition.pruning', 'true',
+             'Make sure tez can prune whole partitions'),
+        Rule('b', 'hive-site', 'hive.exec.parallel', 'true',
+             'Can Hive subqueries be executed in parallel'),
+        Rule('b', 'hive-site', 'hive.auto.convert.join', 'true',
+             'use map joins as much as possible'),
+        Rule('b', 'hive-site', 'hive.auto.convert.join.noconditionaltask', 'true',
+             'Use map joins for small datasets'),
+        Rule('s', 'hive-site', 'hive.tez.container.size', Expr('tezContainerSize'),
+             'Multiple of min container size.'),
+        Rule('i', 'hive-site', 'hive.auto.convert.join.noconditionaltask.size', Expr('0.33 * tezContainerSize * MB'),
+             'Threshold to perform map join. 1/3 * hive.tez.container.size.'),
+        Rule('i', 'hive-site', 'hive.vectorized.groupby.maxentries', 10240,
+             'Reduces execution time on small datasets, but also OK for large ones.'),
+        Rule('s', 'hive-site', 'hive.vectorized.groupby.flush.percent', '0.1',
+             'Reduces execution time on small datasets, but also OK for large ones.'),
+        Rule('b', 'hive-site', 'hive.server2.tez.initialize.default.sessions', 'true',
+             'Enable tez use without session pool if requested'),
+        Rule('i', 'hive-site', 'hive.server2.tez.sessions.per.default.queue', 3,
+             'Number of parallel execution inside one queue.'),
+    ]),
+
+    ("\nHive and Tez memory", [
+        Rule('i', 'tez-site', 'tez.am.resource.memory.mb', Expr('minContainerSizeMB'),
+             'Appmaster memory == min container size.'),
+        Rule('b', 'tez-site', 'tez.am.container.reuse.enabled', 'true',
+             'Reuse tez containers to prevent reallocation.'),
+        Rule('s', 'tez-site', 'tez.container.max.java.heap.fraction', '0.8',
+             'default % of memory used for java opts'),
+        Rule('i', 'tez-site', 'tez.runtime.io.sort.mb', Expr('0.25 * tezContainerSize'),
+             'memory when the output needs to be sorted. == 0.25 * tezContainerSize (up to 40%)'),
+        Rule('i', 'tez-site', 'tez.runtime.unordered.output.buffer.size-mb', Expr('0.075 * tezContainerSize'),
+             'Memory when the output does not need to be sorted. 0.075 * hive.tez.container.size (up to 10%).'),
+        Rule('i', 'tez-site', 'tez.task.resource.memory.mb', Expr('minContainerSizeMB'),
+             'Mem to be used by launched taks. == min container size. '
+             'Overriden by hive to hive.tez.container.size anyway.'),
+        Rule('xmx', 'tez-site', 'tez.task.launch.cmd-opts', Expr('0.8 * minContainerSizeMB'),
+             'xmx = 0.8 * minContainerSize'),
+        Rule('xmx', 'hive-site', 'hive.tez.java.opts', Expr('0.8 * tezContainerSize'),
+             'xmx = 0.8 * tezContainerSize'),
+        Rule('b', 'hive-site', 'hive.prewarm.enabled', 'true',
+             'Enable prewarm to reduce latency'),
+        Rule('s', 'hive-site', 'hive.prewarm.numcontainers', Check('x >= 1'),
+             'Hold containers to reduce latency, >= 1'),
+        Rule('i', 'tez-site', 'tez.session.am.dag.submit.timeout.secs', 300,
+             'Tez Application Master waits for a DAG to be submitted before shutting down. '
+             'Only useful when reuse is enabled.'),
+        Rule('i', 'tez-site', 'tez.am.container.idle.release-timeout-min.millis', 10000,
+             'Tez container min wait before shutting down. '
+             'Should give enough time to an app to send the next query'),
+        Rule('i', 'tez-site', 'tez.am.container.idle.release-timeout-max.millis', 20000,
+             'Tez container min wait before shutting down'),
+        Rule('s', 'tez-site', 'tez.am.view-acls', '*', 'Enable tz ui access'),
+        Rule('s', 'yarn-site', 'yarn.timeline-service.entity-group-fs-store.group-id-plugin-classes',
+             'org.apache.tez.dag.history.logging.ats.TimelineCachePluginImpl',
+             'Set up tez UI'),
+        Rule('s', 'mapred-site', 'mapreduce.job.acl-view-job', '*', 'Enable tez ui for mapred jobs'),
+        Rule('b', 'tez-site', 'tez.am.acls.enabled', 'false',
+             'Enable refreshes on tez-ui by disabling ACLs'),
+    ]),
+
+    ("\nCompress all", [
+        Rule('b', 'mapred-site', 'mapreduce.map.output.compress', 'true'),
+        Rule('b', 'mapred-site', 'mapreduce.output.fileoutputformat.compress', 'true'),
+        Rule('b', 'hive-site', 'hive.exec.compress.intermediate', 'true'),
+        Rule('b', 'hive-site', 'hive.exec.compress.output', 'true'),
+    ]),
+
+    ("\nQueue configuration. Assuming queue {queue} is subqueue from root. "
+     "Note that undefined values are inherited from parent.", [
+        Rule('s', 'capacity-scheduler', 'yarn.scheduler.capacity.root.{queue}.maximum-am-resource-percent',
+             Check("x != 'NOT FOUND' and float(x) >= 0.2"),
+             'How much of the Q the AM can use. Must be at least 0.2.'),
+        Rule('s', 'capacity-scheduler', 'yarn.scheduler.capacity.root.{queue}.ordering-policy', 'fair',
+             'Helps small queries get a chunk of time between big ones'),
+        Rule('s', 'capacity-scheduler', 'yarn.scheduler.capacity.root.{queue}.user-limit-factor',
+             Check("x != 'NOT FOUND' and int(x) >= 1"),
+             'How much of the Q capacity the user can exceed if enough resources. '
+             'Should be at leat 1. 1=100%, 2=200%...'),
+        Rule('s', 'capacity-scheduler', 'yarn.scheduler.capacity.root.{queue}.minimum-user-limit-percent',
+             Check("x != 'NOT FOUND' and int(x) >= 10"),
+             'How much of the Q in percent a user is guaranteed to get. Should be at least 10'),
+    ]),
+
+    ("\nRandom stuff", [
+        Rule('b', 'hdfs-site', 'dfs.client.use.datanode.hostname', 'true', "For AWS only"),
+    ]),
+
+    # TODO: llap container size == tez container size,
+    # see https://community.hortonworks.com/questions/84636/llap-not-using-io-cache.html
+    ("\nLLAP", [
+        Rule('text', None, None, "\nThose configs are probably not good (yet). Need some revision.",
+             when='llap'),
+        Rule('b', 'hive-interactive-env', 'enable_hive_interactive', 'true', 'Enable LLAP', when='llap'),
+        Rule('b', 'yarn-site', 'yarn.resourcemanager.scheduler.monitor.enable', 'true',
+             'mandatory for LLAP', when='llap'),
+        Rule('s', 'hive-site', 'hive.server2.tez.sessions.per.default.queue', Check('x > 0'),
+             '> 0', when='llap'),
+        Rule('s', 'hive-interactive-site', 'hive.llap.daemon.queue.name', Check("x != 'default'"),
+             "Not 'default'", when='llap'),
+        Rule('b', 'hive-interactive-site', 'hive.llap.io.enabled', 'true',
+             'Big performance improvement', when='llap'),
+        Rule('i', 'tez-interactive-site', 'tez.am.resource.memory.mb', Expr('ramPerContainerMB'),
+             'Appmaster memory. == ramPerContainer (for tez/llap)', when='llap'),
+        Rule('s', 'hive-interactive-site', 'hive.llap.io.threadpool.size', Expr('availableCores'),
+             'number of IO threads, == to # of available cores per node.', when='llap'),
+        Rule('i', 'hive-interactive-env', 'num_llap_nodes', Expr('numDNs'),
+             'Number of nodes used for llap. # of actual DNs.', when='llap'),
+        Rule('i', 'hive-interactive-env', 'num_llap_nodes_for_llap_daemons', Expr('numDNs'),
+             'Number of nodes used for llap. # of actual DNs.', when='llap'),
+        Rule('i', 'hive-interactive-site', 'hive.llap.daemon.num.executors', Expr('availableCores'),
+             'Number of fragment a single llap daemon can run. # of available core for this node.',
+             when='llap'),
+        Rule('s', 'hive-interactive-site', 'hive.llap.io.memory.mode', Check("x in ('', 'cache')"),
+             "Must be empty or 'cache' (default) to use off heap cache which is assumed for other computations.",
+             when='llap'),
+        Rule('i', 'hive-interactive-site', 'hive.llap.daemon.yarn.container.mb', Expr('tezContainerSize'),
+             '== tezcontainersize ', when='llap'),
+        Rule('i', 'hive-interactive-site', 'hive.llap.io.memory.size', Expr('0.2 * tezContainerSize'),
+             'Cache per daemon: 0.2 * memoryPerDaemon', when='llap'),
+        Rule('i', 'hive-interactive-env', 'llap_heap_size', Expr('0.8 * tezContainerSize - 500'),
+             'Heap per daemon. 0.8 * memoryPerDaemon - 500MB (headroom)', when='llap'),
+        Rule('b', 'hive-interactive-env', 'enable_hive_interactive', 'false', 'Disable LLAP', when='not llap'),
+    ]),
+
+    (None, [
+        Rule('fyis', None, None, DOC),
+    ]),
+])
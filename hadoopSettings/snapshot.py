@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+# Fields of configurations resources asked for, see Api.call.
+CONFIGURATION_FIELDS = ('type', 'tag', 'properties')
+
+
+class ConfigSnapshot():
+    """
+    Live values of property sets, fetched in as few calls as possible and
+    kept in a flat index (pset, key) => value. Once loaded, reading a value
+    does not hit ambari.
+    """
+
+    # Number of property sets asked for in one call.
+    batchSize = 20
+
+    def __init__(self, api):
+        self.api = api
+        # pset => tag the values were loaded from.
+        self.tags = {}
+        self.index = {}
+        # pset => its keys in the index.
+        self.keys = {}
+
+    def load(self, psets=None, desired=None):
+        """
+        Load property sets `psets` (all the ones known to ambari if None)
+        which are not loaded yet, or were loaded from another tag than
+        the latest (the ones of `desired` if given, see Api.getDesiredConfigs).
+        Batches are fetched concurrently.
+        """
+        batches = self.plan(psets, desired)
+        if len(batches) < 2:
+            fetched = map(self.fetch, batches)
+        else:
+            with ThreadPoolExecutor(max_workers=self.api.config.poolSize) as pool:
+                fetched = list(pool.map(self.fetch, batches))
+        for items in fetched:
+            self.store(items)
+
+    def plan(self, psets=None, desired=None):
+        """
+        Load what can be from the disk cache, and return batches of
+        (pset, tag) still to be fetched.
+        """
+        if desired is None:
+            desired = self.api.getDesiredConfigs()
+        if psets is None:
+            psets = desired.keys()
+
+        cache = self.api.diskCache
+        missing = []
+        for pset in sorted(set(psets)):
+            if pset not in desired:
+                logging.error("Property set {} unknown to ambari.".format(pset))
+                self.tags[pset] = None
+                continue
+
+            tag = desired[pset]['tag']
+            if self.tags.get(pset) == tag:
+                continue
+            properties = cache.getPset(pset, tag) if cache else None
+            if properties is None:
+                missing.append((pset, tag))
+            else:
+                self.add(pset, tag, properties)
+
+        return [missing[i:i + self.batchSize] for i in range(0, len(missing), self.batchSize)]
+
+    def store(self, items):
+        """
+        Index fetched configurations items, and cache them on disk.
+        """
+        cache = self.api.diskCache
+        for item in items:
+            self.add(item['type'], item['tag'], item['properties'])
+            if cache:
+                cache.putPset(item['type'], item['tag'], item['properties'])
+
+    def fetch(self, pairs, fresh=False):
+        """
+        Get all (pset, tag) pairs in one call, bypassing the api cache if fresh.
+        """
+        if not pairs:
+            # An empty predicate would get every version of every pset.
+            return []
+        predicate = '|'.join(
+            '(type={p}&tag={t})'.format(p=pset, t=tag) for pset, tag in pairs
+        )
+        call = self.api.fetch if fresh else self.api.call
+        return call('/configurations?' + predicate, fields=CONFIGURATION_FIELDS)['items']
+
+    def add(self, pset, tag, properties):
+        """
+        Index all properties of pset, forgetting the ones of a previous tag.
+        """
+        for key in self.keys.pop(pset, ()):
+            del self.index[(pset, key)]
+        self.tags[pset] = tag
+        self.keys[pset] = set(properties)
+        for key, v in properties.items():
+            try:
+                # If we have a number, cast it
+                v = int(v)
+            except ValueError:
+                pass
+            self.index[(pset, key)] = v
+
+    def get(self, pset, key):
+        """
+        Return the value of the config `key` from property set `pset`.
+        """
+        if pset not in self.tags:
+            # Not prefetched, better late than never.
+            self.load([pset])
+
+        try:
+            v = self.index[(pset, key)]
+        except KeyError:
+            logging.error(
+                "Could not find {}/{}. Still returns 0 to carry on with script."
+                .format(pset, key)
+            )
+            return 'NOT FOUND'
+
+        logging.info("{p}/{k}={v}".format(p=pset, k=key, v=v))
+        return v
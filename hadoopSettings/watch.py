@@ -0,0 +1,88 @@
+"""
+Watch mode: keep an eye on a cluster, evaluating again only what changed.
+"""
+import logging
+import time
+
+from hadoopSettings.ambariApi import DESIRED_CONFIGS_FIELDS
+from hadoopSettings.exceptions import (AmbariNotReachable, BadResponse)
+from hadoopSettings.results import Result
+
+
+class Watcher():
+    """
+    Each cycle asks ambari for the tags of property sets and the number
+    of DNs only, two small calls. Property sets whose tag moved are
+    fetched again, and their rules evaluated again. A change in the DNs,
+    or in property sets Compute reads itself, changes derived values:
+    all rules are evaluated again then.
+
+    Results are written by renderer, and an exporter, if given, gets the
+    new values after each evaluation.
+    """
+
+    def __init__(self, config, api, ruleset, c, renderer, exporter=None):
+        self.config = config
+        self.api = api
+        self.ruleset = ruleset
+        self.c = c
+        self.renderer = renderer
+        self.exporter = exporter
+        self.numDNs = len(api.getDNInfo())
+
+    def poll(self):
+        """
+        (desired configs, number of DNs), straight from ambari.
+        """
+        desired = self.api.fetch('', fields=DESIRED_CONFIGS_FIELDS)['Clusters']['desired_configs']
+        component = self.api.fetch('/components/DATANODE', fields=('ServiceComponentInfo/installed_count',))
+        return desired, component['ServiceComponentInfo']['installed_count']
+
+    def cycle(self):
+        """
+        One check. Returns the Results, none if nothing changed, after a
+        title saying what changed.
+        """
+        desired, numDNs = self.poll()
+        snapshot = self.c.snapshot
+        changed = {
+            pset for pset in self.ruleset.psets() | set(self.c.psets)
+            if pset in desired and desired[pset]['tag'] != snapshot.tags.get(pset)
+        }
+        hostsChanged = numDNs != self.numDNs
+        if not changed and not hostsChanged:
+            return []
+
+        what = sorted(changed)
+        if hostsChanged:
+            what.append('DNs {a} => {b}'.format(a=self.numDNs, b=numDNs))
+            self.numDNs = numDNs
+        snapshot.load(changed, desired)
+        if hostsChanged or changed & set(self.c.psets):
+            self.c.refresh(hostsChanged)
+            rules = self.ruleset
+        else:
+            rules = self.ruleset.select(changed)
+
+        header = "\n=== {t}: {w} changed".format(t=time.strftime('%Y-%m-%d %H:%M:%S'), w=', '.join(what))
+        return [Result('title', description=header)] + list(rules.evaluate(self.config, self.api, self.c))
+
+    def run(self):
+        """
+        Check every config.watch seconds, until interrupted.
+        """
+        while True:
+            time.sleep(self.config.watch)
+            try:
+                results = self.cycle()
+            except (AmbariNotReachable, BadResponse) as e:
+                logging.error("{e} Trying again in {s:g}s.".format(e=e.message, s=self.config.watch))
+                continue
+            for result in results:
+                self.renderer.write(result)
+            if self.exporter is None:
+                continue
+            if results:
+                self.exporter.publish(self.c)
+            else:
+                self.exporter.check()
@@ -0,0 +1,119 @@
+"""
+What-if capacity planning: Compute's sizing over many cluster shapes at
+once, as numpy arrays. Assumes all data nodes of a shape are identical.
+
+Needs numpy, which the rest of the package does not.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from hadoopSettings.compute import (GB, MB, RESERVED_MEM, MIN_CONTAINER_SIZE)
+
+# Output columns, in order.
+COLUMNS = [
+    'nodes',
+    'memGB',
+    'cores',
+    'disks',
+    'reservedMemGB',
+    'numContainers',
+    'ramPerContainerMB',
+    'yarn.nodemanager.resource.memory-mb',
+    'yarn.nodemanager.resource.cpu-vcores',
+    'yarn.scheduler.minimum-allocation-mb',
+    'mapreduce.map.memory.mb',
+    'mapreduce.reduce.memory.mb',
+    'mapreduce.map.java.opts.xmx',
+    'hive.tez.container.size',
+    'tez.runtime.io.sort.mb',
+]
+
+
+def parseRange(spec):
+    """
+    '10:100:10' (inclusive), '64,128' or '12' to a list of numbers.
+    """
+    if ':' in spec:
+        start, stop, step = (list(map(int, spec.split(':'))) + [1])[:3]
+        return list(range(start, stop + 1, step))
+    return [int(x) for x in spec.split(',')]
+
+
+def steps(table, values, strict):
+    """
+    Vectorized lookup in a (bound, value) table of compute, as used by
+    reservedMem (value <= bound) and minContainerSize (value < bound).
+    """
+    bounds = np.array([b for b, _ in table if b is not None])
+    results = np.array([v for _, v in table])
+    return results[np.searchsorted(bounds, values, side='right' if strict else 'left')]
+
+
+def sweep(nodes, memGB, cores, disks, containers=None):
+    """
+    Sizing for every combination of nodes, memory per node (GB), cores
+    and disks per node. Returns a dict column => array, see COLUMNS.
+    """
+    if np is None:
+        raise ImportError("What-if mode needs numpy.")
+
+    grid = np.meshgrid(
+        np.asarray(nodes, dtype=np.int64),
+        np.asarray(memGB, dtype=np.int64),
+        np.asarray(cores, dtype=np.int64),
+        np.asarray(disks, dtype=np.int64),
+        indexing='ij'
+    )
+    n, memGB, cores, disks = (a.ravel() for a in grid)
+    mem = memGB * GB
+
+    # Same as the graph of Compute, for a cluster of n identical nodes.
+    reservedMem = steps(RESERVED_MEM, mem, strict=False) * GB
+    totalAvailableRam = n * mem - n * reservedMem
+    yarnMemPerNode = (mem * 0.75).astype(np.int64)
+    minContainerSize = steps(MIN_CONTAINER_SIZE, yarnMemPerNode, strict=True) * MB
+    if containers is None:
+        numContainers = np.ceil(np.minimum.reduce([
+            2 * n * cores,
+            1.8 * n * disks,
+            totalAvailableRam / minContainerSize
+        ])).astype(np.int64)
+    else:
+        numContainers = np.full(n.shape, containers, dtype=np.int64)
+    ramPerContainer = np.floor(np.maximum(minContainerSize, totalAvailableRam / numContainers))
+    minContainerSizeMB = minContainerSize // MB
+    tezContainerSize = 2 * minContainerSizeMB * 2
+
+    return dict(zip(COLUMNS, [
+        n,
+        memGB,
+        cores,
+        disks,
+        reservedMem // GB,
+        numContainers,
+        (ramPerContainer // MB).astype(np.int64),
+        yarnMemPerNode // MB,
+        cores - 1,
+        minContainerSizeMB,
+        minContainerSizeMB,
+        2 * minContainerSizeMB,
+        (0.8 * minContainerSizeMB).astype(np.int64),
+        tezContainerSize,
+        (0.25 * tezContainerSize).astype(np.int64),
+    ]))
+
+
+def write(table, f):
+    """
+    Write table as csv to file object f.
+    """
+    np.savetxt(
+        f,
+        np.column_stack([table[c] for c in COLUMNS]),
+        fmt='%d',
+        delimiter=',',
+        header=','.join(COLUMNS),
+        comments=''
+    )
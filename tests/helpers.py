@@ -0,0 +1,15 @@
+from hadoopSettings import fakeAmbari
+from hadoopSettings.config import Config
+
+
+def serve(nodes, **options):
+    """
+    Fake ambari with nodes DNs, Cluster attributes set from options (eg.
+    latency, paging). Returns (server, Config talking to it, 100 DNs per page).
+    """
+    cluster = fakeAmbari.Cluster(nodes)
+    for name, value in options.items():
+        setattr(cluster, name, value)
+    server = fakeAmbari.serve(cluster)
+    config = Config(['127.0.0.1', '--port', str(server.server_address[1]), '--page-size', '100', '--retries', '0'])
+    return server, config
@@ -0,0 +1,137 @@
+import threading
+import unittest
+
+from hadoopSettings.ambariApi import Api
+from hadoopSettings.exceptions import (ClientError, ConfigConflict)
+from tests.helpers import serve
+
+
+class DNInfoTest(unittest.TestCase):
+
+    def getDNInfo(self, nodes, **options):
+        server, config = serve(nodes, **options)
+        self.addCleanup(server.shutdown)
+        api = Api(config)
+        self.addCleanup(api.close)
+        result = {}
+        # A server looping forever must fail the test, not hang it.
+        thread = threading.Thread(target=lambda: result.update(hosts=api.getDNInfo()), daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "getDNInfo did not return")
+        return api, server.cluster, result['hosts']
+
+    def testPages(self):
+        api, cluster, hosts = self.getDNInfo(250)
+        self.assertEqual(len(hosts), 250)
+        self.assertEqual(hosts['dn00001.example.com'], {'cpu': 32, 'mem': 256 * 1024 ** 3})
+        self.assertEqual(hosts.rackOf('dn00249.example.com'), '/rack6')
+        # 3 pages, after the cluster name.
+        self.assertEqual(cluster.requests, 4)
+
+    def testFullPages(self):
+        api, cluster, hosts = self.getDNInfo(200)
+        self.assertEqual(len(hosts), 200)
+        self.assertEqual(cluster.requests, 3)
+
+    def testPagingIgnored(self):
+        for nodes in (50, 100, 250):
+            api, cluster, hosts = self.getDNInfo(nodes, paging=False)
+            self.assertEqual(len(hosts), nodes)
+
+    def testPerHostFallback(self):
+        api, cluster, hosts = self.getDNInfo(30, bulkHosts=False)
+        self.assertEqual(len(hosts), 30)
+        self.assertEqual(hosts['dn00002.example.com'], {'cpu': 8, 'mem': 64 * 1024 ** 3})
+        # Raw hosts are not kept in the response cache.
+        self.assertFalse([key for key in api.responses.entries if key[0].startswith('/hosts/')])
+
+
+class ClientErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        server, config = serve(30)
+        self.addCleanup(server.shutdown)
+        self.cluster = server.cluster
+        self.api = Api(config)
+        self.addCleanup(self.api.close)
+
+    def testRefused(self):
+        self.cluster.refuse = 403
+        with self.assertRaises(ClientError) as e:
+            self.api.getDesiredConfigs()
+        self.assertEqual(e.exception.status, 403)
+        self.assertIn('Refused by the fake ambari.', e.exception.message)
+        # Not kept as if it were the answer.
+        self.cluster.refuse = None
+        self.assertIn('yarn-site', self.api.getDesiredConfigs())
+
+    def testNoFallback(self):
+        self.cluster.refuse = 403
+        requests = self.cluster.requests
+        with self.assertRaises(ClientError):
+            self.api.getDNInfo()
+        # The first page only, not one call per host.
+        self.assertEqual(self.cluster.requests, requests + 1)
+
+
+class UpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        server, config = serve(3)
+        self.addCleanup(server.shutdown)
+        self.cluster = server.cluster
+        # Like a cluster without Hive Interactive.
+        del self.cluster.tags['hive-interactive-env']
+        self.api = Api(config)
+        self.addCleanup(self.api.close)
+
+    def testUpdate(self):
+        tags = dict(self.cluster.tags)
+        key = 'yarn.nodemanager.resource.memory-mb'
+        updated = self.api.update({'yarn-site': {key: '4096'}}, tags)
+
+        self.assertEqual(updated, {'yarn-site'})
+        tag = self.cluster.tags['yarn-site']
+        self.assertNotEqual(tag, tags['yarn-site'])
+        properties = self.cluster.versions[('yarn-site', tag)]
+        self.assertEqual(properties[key], '4096')
+        # The other properties are kept.
+        self.assertEqual(len(properties), len(self.cluster.versions[('yarn-site', tags['yarn-site'])]))
+
+    def testUnknownPset(self):
+        tags = dict(self.cluster.tags)
+        updated = self.api.update({
+            'hive-interactive-env': {'enable_hive_interactive': 'false'},
+            'yarn-site': {'yarn.scheduler.minimum-allocation-mb': '1024'},
+        }, tags)
+
+        self.assertEqual(updated, {'yarn-site'})
+        self.assertNotIn('hive-interactive-env', self.cluster.tags)
+
+    def testOnlyUnknownPsets(self):
+        tags = dict(self.cluster.tags)
+        requests = self.cluster.requests
+        updated = self.api.update({'hive-interactive-env': {'enable_hive_interactive': 'false'}}, tags)
+
+        self.assertEqual(updated, set())
+        self.assertEqual(self.cluster.tags, tags)
+        # Only the desired configs were asked: no configurations, no PUT.
+        self.assertEqual(self.cluster.requests, requests + 1)
+
+    def testConflict(self):
+        tags = dict(self.cluster.tags)
+        self.cluster.tags['yarn-site'] = 'changedMeanwhile'
+        self.cluster.versions[('yarn-site', 'changedMeanwhile')] = {}
+        with self.assertRaises(ConfigConflict):
+            self.api.update({
+                'yarn-site': {'yarn.scheduler.minimum-allocation-mb': '1024'},
+                'hdfs-site': {'dfs.replication': '2'},
+            }, tags)
+        # Nothing updated, not even the psets which did not move.
+        self.assertEqual(self.cluster.tags['yarn-site'], 'changedMeanwhile')
+        self.assertEqual(self.cluster.tags['hdfs-site'], tags['hdfs-site'])
+
+
+if __name__ == '__main__':
+    unittest.main()
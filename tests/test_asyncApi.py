@@ -0,0 +1,72 @@
+import time
+import unittest
+
+from hadoopSettings.ambariApi import Api
+from hadoopSettings.asyncApi import AsyncApi
+from tests.helpers import serve
+
+
+class AsyncApiTest(unittest.IsolatedAsyncioTestCase):
+
+    async def connect(self, nodes, **options):
+        server, config = serve(nodes, **options)
+        self.addCleanup(server.shutdown)
+        api = await AsyncApi.connect(config)
+        self.addCleanup(api.close)
+        return api, server.cluster
+
+    async def testDNInfo(self):
+        api, cluster = await self.connect(250)
+        hosts = await api.getDNInfo()
+
+        sync = Api(api.config)
+        self.addCleanup(sync.close)
+        self.assertEqual(hosts.toDict(), sync.getDNInfo().toDict())
+        # Once, not again.
+        self.assertIs(await api.getDNInfo(), hosts)
+
+    async def testPagesAreConcurrent(self):
+        api, cluster = await self.connect(400, latency=0.2)
+        start = time.perf_counter()
+        hosts = await api.getDNInfo()
+        seconds = time.perf_counter() - start
+
+        self.assertEqual(len(hosts), 400)
+        # The first page, then the 3 others at once: not 4 pages in a row.
+        self.assertLess(seconds, 0.7)
+
+    async def testPagingIgnored(self):
+        api, cluster = await self.connect(250, paging=False)
+        hosts = await api.getDNInfo()
+        self.assertEqual(len(hosts), 250)
+
+    async def testPerHostFallback(self):
+        api, cluster = await self.connect(30, bulkHosts=False)
+        hosts = await api.getDNInfo()
+
+        self.assertEqual(len(hosts), 30)
+        self.assertEqual(hosts['dn00002.example.com'], {'cpu': 8, 'mem': 64 * 1024 ** 3})
+        self.assertFalse([key for key in api.api.responses.entries if key[0].startswith('/hosts/')])
+
+    async def testConfigs(self):
+        api, cluster = await self.connect(3)
+        await api.loadConfigs(['yarn-site', 'hdfs-site', 'hive-site'])
+        requests = cluster.requests
+
+        value = await api.getConfigValue('hdfs-site', 'dfs.datanode.data.dir')
+        self.assertEqual(value, cluster.configs['hdfs-site']['dfs.datanode.data.dir'])
+        self.assertEqual(cluster.requests, requests)
+
+    async def testUpdate(self):
+        api, cluster = await self.connect(3)
+        tags = dict(cluster.tags)
+        await api.update({'yarn-site': {'yarn.nodemanager.resource.memory-mb': '4096'}}, tags)
+
+        tag = cluster.tags['yarn-site']
+        self.assertNotEqual(tag, tags['yarn-site'])
+        self.assertEqual(cluster.versions[('yarn-site', tag)]['yarn.nodemanager.resource.memory-mb'], '4096')
+        self.assertEqual(cluster.tags['hdfs-site'], tags['hdfs-site'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from hadoopSettings import cli
+from hadoopSettings.exceptions import RestartFailed
+from hadoopSettings.report import evaluate
+from tests.helpers import serve
+
+
+class MainTest(unittest.TestCase):
+
+    def setUp(self):
+        server, self.config = serve(5)
+        self.addCleanup(server.shutdown)
+        self.args = ['127.0.0.1', '--port', str(server.server_address[1]), '--retries', '0']
+
+    def testFailingRestart(self):
+        record = os.path.join(tempfile.mkdtemp(), 'record.json')
+        stdout = sys.stdout
+        stale = {'dn00000.example.com': {('YARN', 'NODEMANAGER')}}
+        with mock.patch('hadoopSettings.restart.Restart.staleComponents', return_value=stale), \
+                mock.patch('hadoopSettings.restart.Restart.run', side_effect=RestartFailed('batch 1 failed')):
+            with self.assertRaises(RestartFailed), mock.patch('sys.stderr', io.StringIO()):
+                cli.main(self.args + ['--format', 'jsonl', '--update', '--restart', '--record', record])
+        self.assertIs(sys.stdout, stdout)
+        # The api was closed all the same.
+        self.assertTrue(os.path.exists(record))
+
+    def testReplayingUpdate(self):
+        record = os.path.join(tempfile.mkdtemp(), 'record.json')
+        with mock.patch('sys.stdout', io.StringIO()):
+            cli.main(self.args + ['--record', record])
+        with mock.patch('sys.stdout', io.StringIO()) as out, mock.patch('sys.stderr', io.StringIO()):
+            cli.main(self.args + ['--replay', record, '--update', '--restart'])
+        self.assertIn("Replaying, will not update anything in ambari.", out.getvalue())
+        self.assertNotIn("Update", out.getvalue())
+
+    def testResultsAsEvaluated(self):
+        written = []
+        with evaluate(self.config, write=written.append) as report:
+            self.assertEqual(written, report.results)
+            self.assertTrue(written)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from hadoopSettings.ambariApi import Api
+from hadoopSettings.compute import Compute
+from hadoopSettings.config import Config
+from hadoopSettings.report import evaluate
+from tests.helpers import serve
+
+
+class ExpectsTest(unittest.TestCase):
+
+    def setUp(self):
+        server, self.config = serve(30)
+        self.addCleanup(server.shutdown)
+
+    def testExpectZero(self):
+        api = Api(self.config)
+        self.addCleanup(api.close)
+        c = Compute(self.config, api)
+        self.assertEqual(c.expects('yarn-site', 'some.key', 0, value=0).about, 1)
+        self.assertEqual(c.expects('yarn-site', 'some.key', 0, value=3).about, 0)
+
+    def testLlapCoresPerNode(self):
+        config = Config(['127.0.0.1', '--port', str(self.config.ambariPort), '--retries', '0', '--llap'])
+        with evaluate(config) as report:
+            expected = {r.key: r.expect for r in report.results if r.pset == 'hive-interactive-site'}
+            cores = report.c.graph['availableCores']
+        # More data nodes than cores per node: still the cores of a node.
+        self.assertEqual(expected['hive.llap.io.threadpool.size'], cores)
+        self.assertEqual(expected['hive.llap.daemon.num.executors'], cores)
+        self.assertGreater(cores, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from hadoopSettings import fleet
+from tests.helpers import serve
+
+
+class EvaluateClusterTest(unittest.TestCase):
+
+    def testEvaluate(self):
+        server, config = serve(250)
+        self.addCleanup(server.shutdown)
+        result = fleet.evaluateCluster(config)
+
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['name'], '127.0.0.1/bench')
+        self.assertGreater(result['tofix'], 0)
+        self.assertIn('check', {r.kind for r in result['results']})
+
+    def testUnreachable(self):
+        server, config = serve(1)
+        server.shutdown()
+        server.server_close()
+        result = fleet.evaluateCluster(config)
+
+        self.assertIn('AmbariNotReachable', result['error'])
+        self.assertEqual(result['results'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
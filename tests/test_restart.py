@@ -0,0 +1,85 @@
+import unittest
+
+from hadoopSettings.config import Config
+from hadoopSettings.exceptions import RestartFailed
+from hadoopSettings.restart import Restart
+
+
+class Api():
+    """
+    Enough of Api for Restart: stale components (a NodeManager per host
+    unless given), and restart requests which stay in the given states.
+    """
+
+    replayer = None
+
+    def __init__(self, hosts, states, components=(('YARN', 'NODEMANAGER'),)):
+        self.config = Config(['127.0.0.1', '--cluster', 'c1'])
+        self.hosts = hosts
+        self.states = list(states)
+        self.components = components
+        self.posted = []
+        self.fetched = []
+
+    def fetch(self, path, fields=()):
+        self.fetched.append(path)
+        if path.startswith('/host_components'):
+            return {'items': [
+                {'HostRoles': {'host_name': host, 'service_name': service, 'component_name': component}}
+                for host in self.hosts
+                for service, component in self.components
+            ]}
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return {'Requests': {'request_status': state, 'progress_percent': 50}}
+
+    def post(self, path, body):
+        self.posted.append(body)
+        return {'Requests': {'id': len(self.posted)}}
+
+
+class RestartTest(unittest.TestCase):
+
+    def restart(self, hosts, states, components=(('YARN', 'NODEMANAGER'),), **options):
+        restart = Restart(Api(hosts, states, components), **options)
+        restart.delay = 0.01
+        return restart
+
+    def testHoldingIsDone(self):
+        for state in ('HOLDING_FAILED', 'HOLDING_TIMEDOUT'):
+            restart = self.restart(['dn1'], ['IN_PROGRESS', state], timeout=5)
+            self.assertEqual(restart.wait(1), state)
+
+    def testTimeout(self):
+        restart = self.restart(['dn1'], ['IN_PROGRESS'], timeout=0.1)
+        self.assertEqual(restart.wait(1), 'WAIT_TIMEDOUT')
+
+    def testTimeoutFailsTheBatch(self):
+        restart = self.restart(['dn1', 'dn2'], ['IN_PROGRESS'], batchSize=1, tolerance=1, timeout=0.1)
+        with self.assertRaises(RestartFailed):
+            restart.run()
+        self.assertEqual(len(restart.api.posted), 2)
+
+    def testBatches(self):
+        restart = self.restart(['dn1', 'dn2', 'dn3'], ['COMPLETED'], batchSize=2)
+        self.assertEqual(restart.run(), 0)
+        self.assertEqual([f['hosts'] for body in restart.api.posted for f in body['Requests/resource_filters']],
+                         ['dn1,dn2', 'dn3'])
+
+
+    def testAllStale(self):
+        # Eg. tez-site changed: HiveServer2 reads it too.
+        restart = self.restart(['dn1'], ['COMPLETED'], [('TEZ', 'TEZ_CLIENT'), ('HIVE', 'HIVE_SERVER')])
+        self.assertEqual(restart.stale, {'dn1': {('TEZ', 'TEZ_CLIENT'), ('HIVE', 'HIVE_SERVER')}})
+
+    def testReplaying(self):
+        api = Api(['dn1'], ['COMPLETED'])
+        api.replayer = object()
+        restart = Restart(api)
+        self.assertEqual(restart.stale, {})
+        self.assertEqual(restart.run(), 0)
+        self.assertEqual(api.fetched, [])
+        self.assertEqual(api.posted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
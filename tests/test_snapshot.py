@@ -0,0 +1,23 @@
+import unittest
+
+from hadoopSettings.snapshot import ConfigSnapshot
+
+
+class AddTest(unittest.TestCase):
+
+    def testReplacesOnlyItsPset(self):
+        snapshot = ConfigSnapshot(None)
+        snapshot.add('yarn-site', 'v1', {'a': '1', 'b': 'x'})
+        snapshot.add('hdfs-site', 'v1', {'a': '2'})
+        snapshot.add('yarn-site', 'v2', {'b': 'y', 'c': '3'})
+
+        self.assertEqual(snapshot.index, {
+            ('yarn-site', 'b'): 'y',
+            ('yarn-site', 'c'): 3,
+            ('hdfs-site', 'a'): 2,
+        })
+        self.assertEqual(snapshot.tags, {'yarn-site': 'v2', 'hdfs-site': 'v1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Work out recommended settings for cluster shapes which do not exist (yet).
+"""
+import argparse
+import sys
+import time
+
+from hadoopSettings import whatif
+
+
+parser = argparse.ArgumentParser(
+    description='Work out yarn/tez/map reduce settings over ranges of cluster shapes, '
+    'assuming identical data nodes. Ranges are start:stop[:step] (inclusive), '
+    'comma separated values, or a single value. Outputs csv.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    '--nodes', '-n',
+    dest='nodes',
+    type=whatif.parseRange,
+    default='10',
+    help='Number of data nodes.'
+)
+parser.add_argument(
+    '--mem', '-m',
+    dest='mem',
+    type=whatif.parseRange,
+    default='128',
+    help='Memory per node, in GB.'
+)
+parser.add_argument(
+    '--cores',
+    dest='cores',
+    type=whatif.parseRange,
+    default='16',
+    help='Cores per node.'
+)
+parser.add_argument(
+    '--disks', '-d',
+    dest='disks',
+    type=whatif.parseRange,
+    default='12',
+    help='Data disks per node.'
+)
+parser.add_argument(
+    '--containers', '-c',
+    dest='containers',
+    type=int,
+    default=None,
+    help='Force the number of containers.'
+)
+args = parser.parse_args()
+
+start = time.time()
+table = whatif.sweep(args.nodes, args.mem, args.cores, args.disks, args.containers)
+print("{n} scenarios computed in {s:.3f}s".format(n=len(table['nodes']), s=time.time() - start), file=sys.stderr)
+whatif.write(table, sys.stdout.buffer)